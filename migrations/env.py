@@ -32,6 +32,18 @@ target_metadata = table_register.metadata
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the SQLite full-text search tables out of autogenerate.
+
+    `todos_fts` and its `todos_fts_*` shadow tables are created by raw DDL
+    in src/search.py, not by the ORM metadata.
+    """
+    if type_ == "table" and reflected and compare_to is None:
+        return not (name == "todos_fts" or name.startswith("todos_fts_"))
+
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -48,6 +60,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -57,7 +70,11 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,29 @@
+"""add_users_token_version
+
+Revision ID: 2a7f0c9d3e18
+Revises: 9e4c1f7a2b63
+Create Date: 2025-11-17 14:08:33.190562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a7f0c9d3e18'
+down_revision: Union[str, Sequence[str], None] = '9e4c1f7a2b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
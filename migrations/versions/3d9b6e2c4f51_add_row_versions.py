@@ -0,0 +1,33 @@
+"""add_row_versions
+
+Revision ID: 3d9b6e2c4f51
+Revises: 7c3e5a1f9b20
+Create Date: 2025-11-19 16:37:12.448019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9b6e2c4f51'
+down_revision: Union[str, Sequence[str], None] = '7c3e5a1f9b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('todos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Not a batch operation: recreating `todos` would drop its FTS triggers.
+    op.drop_column('todos', 'version')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,39 @@
+"""add_todos_user_indexes
+
+Revision ID: 5b2d8e41c7a9
+Revises: eebd9e9ab08e
+Create Date: 2025-11-12 10:02:47.318214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2d8e41c7a9'
+down_revision: Union[str, Sequence[str], None] = 'eebd9e9ab08e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_todos_user_id_id', 'todos', ['user_id', 'id'], unique=False)
+    op.create_index('ix_todos_user_id_status_id', 'todos', ['user_id', 'status', 'id'], unique=False)
+    op.create_index(
+        'ix_todos_user_id_done_at',
+        'todos',
+        ['user_id', 'done_at'],
+        unique=False,
+        sqlite_where=sa.text('done_at IS NOT NULL'),
+        postgresql_where=sa.text('done_at IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_user_id_done_at', table_name='todos')
+    op.drop_index('ix_todos_user_id_status_id', table_name='todos')
+    op.drop_index('ix_todos_user_id_id', table_name='todos')
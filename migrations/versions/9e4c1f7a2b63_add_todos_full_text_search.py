@@ -0,0 +1,80 @@
+"""add_todos_full_text_search
+
+Revision ID: 9e4c1f7a2b63
+Revises: 5b2d8e41c7a9
+Create Date: 2025-11-13 09:41:05.772310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c1f7a2b63'
+down_revision: Union[str, Sequence[str], None] = '5b2d8e41c7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_UPGRADE = [
+    """
+    CREATE VIRTUAL TABLE todos_fts USING fts5(
+        title, description, content='todos', content_rowid='rowid'
+    )
+    """,
+    """
+    CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_au AFTER UPDATE OF title, description ON todos
+    BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    "INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS todos_fts_au',
+    'DROP TRIGGER IF EXISTS todos_fts_ad',
+    'DROP TRIGGER IF EXISTS todos_fts_ai',
+    'DROP TABLE IF EXISTS todos_fts',
+]
+
+POSTGRES_UPGRADE = [
+    "CREATE INDEX ix_todos_search ON todos USING gin "
+    "(to_tsvector('simple', "
+    "coalesce(title, '') || ' ' || coalesce(description, '')))",
+]
+
+POSTGRES_DOWNGRADE = [
+    'DROP INDEX IF EXISTS ix_todos_search',
+]
+
+
+def _run(statements_by_dialect: dict[str, list[str]]) -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in statements_by_dialect.get(dialect, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE})
@@ -0,0 +1,111 @@
+"""cascade_todos_user_id_delete
+
+Revision ID: a6d4e1f8c3b5
+Revises: f0c3a8e6b2d9
+Create Date: 2025-11-25 10:21:37.166094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d4e1f8c3b5'
+down_revision: Union[str, Sequence[str], None] = 'f0c3a8e6b2d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite cannot alter a foreign key, so `todos` is rebuilt. That drops the
+# triggers on it and renumbers the rowids the FTS index points at.
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+SQLITE_FOREIGN_KEY = 'fk_todos_user_id_users'
+POSTGRES_FOREIGN_KEY = 'todos_user_id_fkey'
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_au AFTER UPDATE OF title, description ON todos
+    BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    "INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')",
+    """
+    CREATE TRIGGER todo_status_counts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_ad AFTER DELETE ON todos BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_au
+    AFTER UPDATE OF status, user_id ON todos
+    WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id
+    BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+
+def _rebuild_sqlite_todos(ondelete: str | None) -> None:
+    with op.batch_alter_table(
+        'todos', recreate='always', naming_convention=NAMING_CONVENTION
+    ) as batch_op:
+        batch_op.drop_constraint(SQLITE_FOREIGN_KEY, type_='foreignkey')
+        batch_op.create_foreign_key(
+            SQLITE_FOREIGN_KEY, 'users', ['user_id'], ['id'], ondelete=ondelete
+        )
+
+    for statement in SQLITE_TRIGGERS:
+        op.execute(statement)
+
+
+def _replace_postgres_foreign_key(ondelete: str | None) -> None:
+    op.drop_constraint(POSTGRES_FOREIGN_KEY, 'todos', type_='foreignkey')
+    op.create_foreign_key(
+        POSTGRES_FOREIGN_KEY, 'todos', 'users', ['user_id'], ['id'], ondelete=ondelete
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild_sqlite_todos(ondelete='CASCADE')
+    else:
+        _replace_postgres_foreign_key(ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        _rebuild_sqlite_todos(ondelete=None)
+    else:
+        _replace_postgres_foreign_key(ondelete=None)
@@ -0,0 +1,121 @@
+"""create_todo_status_counts_table
+
+Revision ID: b41f8d6a2c07
+Revises: 3d9b6e2c4f51
+Create Date: 2025-11-20 10:12:54.903317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f8d6a2c07'
+down_revision: Union[str, Sequence[str], None] = '3d9b6e2c4f51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+    INSERT INTO todo_status_counts (user_id, status, count)
+    SELECT user_id, status, count(*) FROM todos GROUP BY user_id, status
+"""
+
+SQLITE_UPGRADE = [
+    """
+    CREATE TRIGGER todo_status_counts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_ad AFTER DELETE ON todos BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_au
+    AFTER UPDATE OF status, user_id ON todos
+    WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id
+    BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS todo_status_counts_au',
+    'DROP TRIGGER IF EXISTS todo_status_counts_ad',
+    'DROP TRIGGER IF EXISTS todo_status_counts_ai',
+]
+
+POSTGRES_UPGRADE = [
+    """
+    CREATE FUNCTION todo_status_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE todo_status_counts SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO todo_status_counts(user_id, status, count)
+            VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET count = todo_status_counts.count + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_aid AFTER INSERT OR DELETE ON todos
+    FOR EACH ROW EXECUTE FUNCTION todo_status_counts_apply()
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_au
+    AFTER UPDATE OF status, user_id ON todos FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION todo_status_counts_apply()
+    """,
+]
+
+POSTGRES_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS todo_status_counts_au ON todos',
+    'DROP TRIGGER IF EXISTS todo_status_counts_aid ON todos',
+    'DROP FUNCTION IF EXISTS todo_status_counts_apply()',
+]
+
+
+def _run(statements_by_dialect: dict[str, list[str]]) -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in statements_by_dialect.get(dialect, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('todo_status_counts',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'status')
+    )
+    # Counted in the same transaction the triggers are created in, so no
+    # write can slip in between.
+    op.execute(BACKFILL)
+    _run({'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE})
+    op.drop_table('todo_status_counts')
@@ -0,0 +1,135 @@
+"""create_todo_changes_table
+
+Revision ID: c9e2f4a7d1b6
+Revises: a6d4e1f8c3b5
+Create Date: 2025-11-26 09:47:12.518330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e2f4a7d1b6'
+down_revision: Union[str, Sequence[str], None] = 'a6d4e1f8c3b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+    INSERT INTO todo_changes (todo_id, user_id, seq, deleted)
+    SELECT id, user_id, row_number() OVER (PARTITION BY user_id ORDER BY id),
+           false
+    FROM todos
+"""
+
+SQLITE_UPSERT = """
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            {row}.id,
+            {row}.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = {row}.user_id),
+            {deleted}
+        )
+        ON CONFLICT(todo_id) DO UPDATE SET
+            user_id = excluded.user_id,
+            seq = excluded.seq,
+            deleted = excluded.deleted;
+"""
+
+SQLITE_UPGRADE = [
+    'CREATE TRIGGER todo_changes_ai AFTER INSERT ON todos BEGIN'
+    + SQLITE_UPSERT.format(row='new', deleted=0)
+    + 'END',
+    'CREATE TRIGGER todo_changes_au AFTER UPDATE ON todos BEGIN'
+    + SQLITE_UPSERT.format(row='new', deleted=0)
+    + 'END',
+    'CREATE TRIGGER todo_changes_ad AFTER DELETE ON todos '
+    'WHEN EXISTS (SELECT 1 FROM users WHERE id = old.user_id) BEGIN'
+    + SQLITE_UPSERT.format(row='old', deleted=1)
+    + 'END',
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS todo_changes_ad',
+    'DROP TRIGGER IF EXISTS todo_changes_au',
+    'DROP TRIGGER IF EXISTS todo_changes_ai',
+]
+
+POSTGRES_UPGRADE = [
+    """
+    CREATE FUNCTION todo_changes_record() RETURNS trigger AS $$
+    DECLARE
+        changed todos%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        PERFORM 1 FROM users WHERE id = changed.user_id FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            changed.id,
+            changed.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = changed.user_id),
+            TG_OP = 'DELETE'
+        )
+        ON CONFLICT (todo_id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            seq = EXCLUDED.seq,
+            deleted = EXCLUDED.deleted;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER todo_changes_record
+    AFTER INSERT OR UPDATE OR DELETE ON todos
+    FOR EACH ROW EXECUTE FUNCTION todo_changes_record()
+    """,
+]
+
+POSTGRES_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS todo_changes_record ON todos',
+    'DROP FUNCTION IF EXISTS todo_changes_record()',
+]
+
+
+def _run(statements_by_dialect: dict[str, list[str]]) -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in statements_by_dialect.get(dialect, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('todo_changes',
+    sa.Column('todo_id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('todo_id')
+    )
+    op.create_index('ix_todo_changes_user_id_seq', 'todo_changes', ['user_id', 'seq'], unique=True)
+    # Existing todos start out as one change each, so a first sync with
+    # `since=0` returns all of them.
+    op.execute(BACKFILL)
+    _run({'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE})
+    op.drop_index('ix_todo_changes_user_id_seq', table_name='todo_changes')
+    op.drop_table('todo_changes')
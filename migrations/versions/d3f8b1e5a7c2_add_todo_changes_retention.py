@@ -0,0 +1,138 @@
+"""add_todo_changes_retention
+
+Revision ID: d3f8b1e5a7c2
+Revises: c9e2f4a7d1b6
+Create Date: 2025-11-27 14:05:41.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8b1e5a7c2'
+down_revision: Union[str, Sequence[str], None] = 'c9e2f4a7d1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_UPSERT = """
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            {row}.id,
+            {row}.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = {row}.user_id),
+            {deleted}
+        )
+        ON CONFLICT(todo_id) DO UPDATE SET
+            user_id = excluded.user_id,
+            seq = excluded.seq,
+            deleted = excluded.deleted{changed_at};
+"""
+
+
+SQLITE_DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS todo_changes_ad',
+    'DROP TRIGGER IF EXISTS todo_changes_au',
+    'DROP TRIGGER IF EXISTS todo_changes_ai',
+]
+
+
+def _sqlite_triggers(changed_at: str) -> list[str]:
+    return [
+        'CREATE TRIGGER todo_changes_ai AFTER INSERT ON todos BEGIN'
+        + SQLITE_UPSERT.format(row='new', deleted=0, changed_at=changed_at)
+        + 'END',
+        'CREATE TRIGGER todo_changes_au AFTER UPDATE ON todos BEGIN'
+        + SQLITE_UPSERT.format(row='new', deleted=0, changed_at=changed_at)
+        + 'END',
+        'CREATE TRIGGER todo_changes_ad AFTER DELETE ON todos '
+        'WHEN EXISTS (SELECT 1 FROM users WHERE id = old.user_id) BEGIN'
+        + SQLITE_UPSERT.format(row='old', deleted=1, changed_at=changed_at)
+        + 'END',
+    ]
+
+
+POSTGRES_FUNCTION = """
+    CREATE OR REPLACE FUNCTION todo_changes_record() RETURNS trigger AS $$
+    DECLARE
+        changed todos%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        PERFORM 1 FROM users WHERE id = changed.user_id FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            changed.id,
+            changed.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = changed.user_id),
+            TG_OP = 'DELETE'
+        )
+        ON CONFLICT (todo_id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            seq = EXCLUDED.seq,
+            deleted = EXCLUDED.deleted{changed_at};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+CHANGED_AT = ',\n            changed_at = CURRENT_TIMESTAMP'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    changed_at = sa.Column(
+        'changed_at',
+        sa.DateTime(),
+        server_default=sa.text('(CURRENT_TIMESTAMP)'),
+        nullable=False,
+    )
+    # SQLite cannot add a column with a non-constant default, so the table
+    # is rebuilt; existing rows count as changed now. The triggers writing
+    # to it would block the rebuild, so they are recreated around it.
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_DROP_TRIGGERS:
+            op.execute(statement)
+        with op.batch_alter_table('todo_changes', recreate='always') as batch_op:
+            batch_op.add_column(changed_at)
+        for statement in _sqlite_triggers(CHANGED_AT):
+            op.execute(statement)
+    else:
+        op.add_column('todo_changes', changed_at)
+        op.execute(POSTGRES_FUNCTION.format(changed_at=CHANGED_AT))
+
+    op.create_table('todo_change_horizons',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('todo_change_horizons')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_DROP_TRIGGERS:
+            op.execute(statement)
+        with op.batch_alter_table('todo_changes', recreate='always') as batch_op:
+            batch_op.drop_column('changed_at')
+        for statement in _sqlite_triggers(''):
+            op.execute(statement)
+    else:
+        op.execute(POSTGRES_FUNCTION.format(changed_at=''))
+        op.drop_column('todo_changes', 'changed_at')
@@ -0,0 +1,42 @@
+"""add_users_username_prefix_index
+
+Revision ID: e5a2c7b9d814
+Revises: b41f8d6a2c07
+Create Date: 2025-11-21 09:03:18.275661
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a2c7b9d814'
+down_revision: Union[str, Sequence[str], None] = 'b41f8d6a2c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite's unique index on users.username already serves prefix ranges.
+POSTGRES_UPGRADE = [
+    'CREATE INDEX ix_users_username_c ON users (username COLLATE "C")',
+]
+
+POSTGRES_DOWNGRADE = [
+    'DROP INDEX IF EXISTS ix_users_username_c',
+]
+
+
+def _run(statements_by_dialect: dict[str, list[str]]) -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in statements_by_dialect.get(dialect, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({'postgresql': POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({'postgresql': POSTGRES_DOWNGRADE})
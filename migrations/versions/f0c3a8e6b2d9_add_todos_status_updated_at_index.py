@@ -0,0 +1,27 @@
+"""add_todos_status_updated_at_index
+
+Revision ID: f0c3a8e6b2d9
+Revises: e5a2c7b9d814
+Create Date: 2025-11-24 13:46:02.581930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0c3a8e6b2d9'
+down_revision: Union[str, Sequence[str], None] = 'e5a2c7b9d814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_todos_status_updated_at', 'todos', ['status', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_status_updated_at', table_name='todos')
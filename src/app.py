@@ -1,13 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from src.db import async_session
+from src.instrumentation import QueryStatsMiddleware, RequestMetricsMiddleware
+from src.jobs import job_queue
+from src.metrics import render
 from src.routers import auth, todos, users
+from src.security.revocation import revocation_list
+from src.settings import get_settings
+from src.tasks import purge_changes_periodically, purge_trash_periodically
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with async_session() as session:
+        await revocation_list.rebuild(session)
+
+    rebuild_revocations = asyncio.create_task(
+        revocation_list.rebuild_periodically(
+            async_session, get_settings().REVOCATION_REBUILD_SECONDS
+        )
+    )
+
+    purge_trash = asyncio.create_task(
+        purge_trash_periodically(
+            async_session, get_settings().TRASH_PURGE_INTERVAL_SECONDS
+        )
+    )
+    purge_changes = asyncio.create_task(
+        purge_changes_periodically(
+            async_session, get_settings().TODO_CHANGES_PURGE_INTERVAL_SECONDS
+        )
+    )
+    job_queue.start(async_session)
+
+    yield
+
+    rebuild_revocations.cancel()
+    purge_trash.cancel()
+    purge_changes.cancel()
+    await job_queue.stop(get_settings().JOBS_SHUTDOWN_TIMEOUT_SECONDS)
+
 
 app = FastAPI(
     title='To Do List',
     description='API for To Do List',
     version='1.0.0',
+    lifespan=lifespan,
 )
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(todos.router)
@@ -16,3 +63,10 @@ app.include_router(todos.router)
 @app.get('/')
 async def index_root():
     return dict(message='Welcome, the To Do List')
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        render(), media_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+from time import monotonic
+
+
+class TTLCache[K, V]:
+    """Bounded LRU mapping whose entries expire `ttl` seconds after set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: K) -> V | None:
+        item = self._items.get(key)
+
+        if item is None:
+            return None
+
+        expires_at, value = item
+
+        if expires_at <= monotonic():
+            del self._items[key]
+            return None
+
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._items[key] = (monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
@@ -1,25 +1,223 @@
+import logging
+from contextvars import ContextVar
+from time import monotonic
 from typing import Annotated
+from uuid import UUID
 
 from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.pool import QueuePool
 
-from src.settings import Settings
+from src.cache import TTLCache
+from src.instrumentation import instrument
+from src.metrics import Gauge, on_collect
+from src.settings import Settings, get_settings
 
-engine = create_async_engine(Settings().DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+# What a replica that is down or unreachable raises on connect.
+CONNECT_ERRORS = (DBAPIError, OSError)
+
+
+def _set_sqlite_pragmas(settings: Settings, dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}')
+    # Off by default per connection, and with it every ON DELETE CASCADE.
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def build_engine(settings: Settings, url: str | None = None) -> AsyncEngine:
+    """Engine for `url`, the primary DATABASE_URL by default."""
+    url = make_url(url or settings.DATABASE_URL)
+    options = dict(
+        echo=settings.DATABASE_ECHO,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    )
+
+    # In-memory SQLite lives on a single shared connection, so there is no
+    # pool to size.
+    if url.database not in {None, '', ':memory:'}:
+        options.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        )
+
+    engine = create_async_engine(url, **options)
+    instrument(engine)
+
+    if url.get_backend_name() == 'sqlite':
+
+        @event.listens_for(engine.sync_engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            _set_sqlite_pragmas(settings, dbapi_connection)
+
+    return engine
+
+
+# The user the current request is authenticated as, set by the auth
+# dependencies, so sessions can tell whose writes and reads they serve.
+current_user_id: ContextVar[UUID | None] = ContextVar(
+    'current_user_id', default=None
+)
+
+
+class RoutingSession(OrmSession):
+    """Sends SELECTs to `info['replica']`, when set, until the first write.
+
+    Writes, and every statement after the first one, go to the primary the
+    session is bound to, so a session always reads its own writes. So do
+    the reads of a user who committed a write recently.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get('replica')
+
+        if self._flushing or not getattr(clause, 'is_select', False):
+            self.info['wrote'] = True
+
+        if (
+            replica is not None
+            and not self.info.get('wrote')
+            and recent_writers.get(current_user_id.get()) is None
+        ):
+            return replica
+
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class ReplicaPool:
+    """Read replicas taken in turn, skipping any that failed recently."""
+
+    def __init__(self, engines: list[AsyncEngine], retry_after: float):
+        self.engines = engines
+        self.retry_after = retry_after
+        self._turn = 0
+        self._down_until: dict[AsyncEngine, float] = {}
+
+    def healthy(self) -> list[AsyncEngine]:
+        """Replicas to try for the next session, in round-robin order."""
+        if not self.engines:
+            return []
+
+        start = self._turn
+        self._turn = (self._turn + 1) % len(self.engines)
+        now = monotonic()
+        return [
+            engine
+            for engine in self.engines[start:] + self.engines[:start]
+            if self._down_until.get(engine, 0) <= now
+        ]
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        logger.warning('Replica %s is unreachable', engine.url)
+        self._down_until[engine] = monotonic() + self.retry_after
+
+
+async def bind_replica(session: AsyncSession, replicas: ReplicaPool) -> bool:
+    """Point the session's reads at the first healthy replica that connects.
+
+    Returns False, leaving reads on the primary, when none does.
+    """
+    for replica in replicas.healthy():
+        try:
+            await session.connection(
+                bind_arguments={'bind': replica.sync_engine}
+            )
+        except CONNECT_ERRORS:
+            replicas.mark_down(replica)
+            await session.rollback()
+            continue
+
+        session.info['replica'] = replica.sync_engine
+        return True
+
+    return False
+
+
+engine = build_engine(get_settings())
+
+replicas = ReplicaPool(
+    [
+        build_engine(get_settings(), url)
+        for url in get_settings().DATABASE_REPLICA_URLS
+    ],
+    retry_after=get_settings().DATABASE_REPLICA_RETRY_SECONDS,
+)
+
+db_pool_checked_out = Gauge(
+    'db_pool_checked_out_connections',
+    'Pooled connections currently in use, by engine.',
+    ('engine',),
+)
+db_pool_overflow = Gauge(
+    'db_pool_overflow_connections',
+    'Connections open beyond the pool size, by engine.',
+    ('engine',),
+)
+
+
+@on_collect
+def _pool_usage():
+    engines = [('primary', engine)] + [
+        (f'replica{number}', replica)
+        for number, replica in enumerate(replicas.engines, 1)
+    ]
+
+    for name, pooled in engines:
+        # In-memory SQLite shares one connection instead of a pool.
+        if isinstance(pooled.pool, QueuePool):
+            db_pool_checked_out.labels(name).set(pooled.pool.checkedout())
+            db_pool_overflow.labels(name).set(max(pooled.pool.overflow(), 0))
+
+
+# Users that committed a write recently. Their reads stay on the primary
+# until the replicas have caught up.
+recent_writers: TTLCache[UUID, bool] = TTLCache(
+    maxsize=get_settings().DATABASE_READ_YOUR_WRITES_MAX_USERS,
+    ttl=get_settings().DATABASE_READ_YOUR_WRITES_SECONDS,
+)
 
 async_session = async_sessionmaker(
     engine,
     expire_on_commit=False,
+    sync_session_class=RoutingSession,
 )
 
 
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_writer(session: OrmSession):
+    user_id = current_user_id.get()
+
+    if user_id is not None and session.info.get('wrote'):
+        recent_writers.set(user_id, True)
+
+
 async def get_session():
     async with async_session() as session:
         yield session
 
 
+async def get_read_session():
+    """Session for read-only handlers, served by a replica when possible."""
+    async with async_session() as session:
+        await bind_replica(session, replicas)
+        yield session
+
+
 Session = Annotated[AsyncSession, Depends(get_session)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
@@ -0,0 +1,77 @@
+from hashlib import blake2b
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import Depends, Header, HTTPException, Response
+
+
+def row_etag(row_id: UUID, version: int) -> str:
+    """Strong ETag of one row, readable back by `matched_versions`."""
+    return f'"{row_id.hex}-{version}"'
+
+
+def digest_etag(*parts) -> str:
+    """Strong ETag summarizing `parts`, e.g. the result of an aggregate."""
+    digest = blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag})
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(412, 'Precondition failed')
+
+
+def _entity_tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+class ConditionalRequest:
+    """A request's precondition headers and the headers to answer with."""
+
+    def __init__(
+        self,
+        if_match: Annotated[str | None, Header(alias='If-Match')] = None,
+        if_none_match: Annotated[
+            str | None, Header(alias='If-None-Match')
+        ] = None,
+    ):
+        self.if_match = if_match
+        self.if_none_match = if_none_match
+        self.headers: dict[str, str] = {}
+
+    def set_etag(self, etag: str) -> None:
+        self.headers['ETag'] = etag
+
+    def is_fresh(self, etag: str) -> bool:
+        """Whether the copy the client holds per `If-None-Match` is current."""
+        if self.if_none_match is None:
+            return False
+
+        tags = _entity_tags(self.if_none_match)
+        # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+        return '*' in tags or etag in [tag.removeprefix('W/') for tag in tags]
+
+    def matched_versions(self, row_id: UUID) -> list[int] | None:
+        """Versions of `row_id` accepted by `If-Match`, None if unguarded."""
+        if self.if_match is None:
+            return None
+
+        tags = _entity_tags(self.if_match)
+
+        if '*' in tags:
+            return None
+
+        prefix = f'"{row_id.hex}-'
+        return [
+            int(tag[len(prefix) : -1])
+            for tag in tags
+            if tag.startswith(prefix)
+            and tag.endswith('"')
+            and tag[len(prefix) : -1].isdigit()
+        ]
+
+
+Conditional = Annotated[ConditionalRequest, Depends()]
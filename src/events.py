@@ -0,0 +1,96 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from uuid import UUID
+
+from src.settings import get_settings
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    type: str
+    data: str  # Already JSON, so it is encoded once for every subscriber.
+
+    def sse(self) -> str:
+        return f'event: {self.type}\ndata: {self.data}\n\n'
+
+    def json(self) -> str:
+        return f'{{"type":"{self.type}","data":{self.data}}}'
+
+
+class Subscription:
+    """One open stream's bounded backlog of events."""
+
+    def __init__(self, max_queued: int):
+        self._queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=max_queued)
+
+    async def get(self, timeout: float) -> Event:
+        """Wait up to `timeout` seconds for the next event.
+
+        Raises TimeoutError when none arrives in time, and QueueShutDown
+        once the subscription was dropped and its backlog is drained.
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def put(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._queue.shutdown()
+        except asyncio.QueueShutDown:
+            pass
+
+
+class EventBroker:
+    """In-process fan-out of todo events to their owner's open streams.
+
+    A subscriber that falls `max_queued` events behind is dropped rather
+    than allowed to grow without bound or slow down publishers; its client
+    reconnects and catches up through GET /todos/changes. Only streams
+    connected to this process see its events.
+    """
+
+    def __init__(self, max_queued: int):
+        self.max_queued = max_queued
+        self._subscribers: dict[UUID, set[Subscription]] = {}
+
+    def has_subscribers(self, user_id: UUID) -> bool:
+        return user_id in self._subscribers
+
+    @contextmanager
+    def subscribe(self, user_id: UUID) -> Iterator[Subscription]:
+        subscription = Subscription(self.max_queued)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers[user_id]
+            subscribers.discard(subscription)
+
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: UUID, event: Event) -> None:
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.put(event)
+
+
+broker = EventBroker(max_queued=get_settings().EVENTS_MAX_QUEUED)
+
+
+async def sse_stream(user_id: UUID, keepalive: float) -> AsyncIterator[str]:
+    """Server-sent events for `user_id` until the subscription is dropped."""
+    with broker.subscribe(user_id) as subscription:
+        while True:
+            try:
+                event = await subscription.get(keepalive)
+            except TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield ': keepalive\n\n'
+                continue
+            except asyncio.QueueShutDown:
+                return
+
+            yield event.sse()
@@ -0,0 +1,228 @@
+import logging
+from collections import Counter as StatementCounter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.metrics import Counter, Gauge, Histogram
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+db_queries = Counter(
+    'db_queries_total', 'SQL statements run per request route.', ('route',)
+)
+db_query_seconds = Counter(
+    'db_query_seconds_total',
+    'Time spent in SQL statements per request route.',
+    ('route',),
+)
+db_slow_queries = Counter(
+    'db_slow_queries_total', 'SQL statements slower than the slow query log.'
+)
+http_requests = Counter(
+    'http_requests_total',
+    'Requests handled, by method, route and status.',
+    ('method', 'route', 'status'),
+)
+http_request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Time taken to handle requests, by method and route.',
+    ('method', 'route'),
+)
+http_requests_in_progress = Gauge(
+    'http_requests_in_progress', 'Requests being handled right now.'
+)
+
+
+class NPlusOneError(Exception):
+    """One statement ran too many times while handling a single request."""
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """SQL run while handling one request, or inside `track_queries`."""
+
+    name: str = '-'
+    scope: Scope | None = None
+    count: int = 0
+    duration: float = 0
+    statements: StatementCounter[str] = field(default_factory=StatementCounter)
+
+    @property
+    def route(self) -> str:
+        """The request's matched route, the same one its metrics use."""
+        return self.name if self.scope is None else _route(self.scope)
+
+    def server_timing(self) -> str:
+        duration = self.duration * 1000
+        return f'db;dur={duration:.1f};desc="{self.count} queries"'
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar(
+    'current_stats', default=None
+)
+
+
+@contextmanager
+def track_queries(
+    route: str = '-', *, scope: Scope | None = None
+) -> Iterator[QueryStats]:
+    """Collect the SQL run in this context into the yielded stats."""
+    stats = QueryStats(route, scope)
+    token = current_stats.set(stats)
+
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+
+def _route(scope: Scope) -> str:
+    # Set once routing matched, so unmatched paths are not each counted as
+    # a route of their own.
+    return getattr(scope.get('route'), 'path', 'unmatched')
+
+
+def _redacted(parameters, executemany: bool) -> str:
+    """Show the shape of the parameters, never their values."""
+    if executemany:
+        return f'<{len(parameters)} parameter sets>'
+
+    if isinstance(parameters, dict):
+        return repr(dict.fromkeys(parameters, '?'))
+
+    return repr(('?',) * len(parameters or ()))
+
+
+def _before_cursor_execute(context, statement, **kw):
+    # Kept on the statement's own context, so a statement that raises
+    # leaves nothing behind on the pooled connection.
+    context.query_started = perf_counter()
+    stats = current_stats.get()
+
+    if stats is None:
+        return
+
+    stats.statements[statement] += 1
+    threshold = get_settings().SQL_N_PLUS_ONE_THRESHOLD
+
+    # Flagged once, when the same statement comes back `threshold` times.
+    if stats.statements[statement] == threshold:
+        logger.warning(
+            'Possible N+1 on %s, ran %d times: %s',
+            stats.route,
+            threshold,
+            statement,
+        )
+
+        if get_settings().SQL_N_PLUS_ONE_RAISE:
+            raise NPlusOneError(statement)
+
+
+def _after_cursor_execute(context, statement, parameters, executemany, **kw):
+    elapsed = perf_counter() - context.query_started
+    stats = current_stats.get()
+
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+
+    if elapsed >= get_settings().SQL_SLOW_QUERY_SECONDS:
+        db_slow_queries.inc()
+        logger.warning(
+            'Slow query on %s took %.1f ms: %s %s',
+            stats.route if stats is not None else '-',
+            elapsed * 1000,
+            statement,
+            _redacted(parameters, executemany),
+        )
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Time every statement `engine` runs and attribute it to the request."""
+    event.listen(
+        engine.sync_engine,
+        'before_cursor_execute',
+        _before_cursor_execute,
+        named=True,
+    )
+    event.listen(
+        engine.sync_engine,
+        'after_cursor_execute',
+        _after_cursor_execute,
+        named=True,
+    )
+
+
+class QueryStatsMiddleware:
+    """Track each request's SQL and report it in a `Server-Timing` header.
+
+    Statements run while a streaming response is being sent count towards
+    the route's metrics but not the header, which is already sent by then.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_timing(message: Message):
+            if message['type'] == 'http.response.start' and stats.count:
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', stats.server_timing())
+
+            await send(message)
+
+        with track_queries(scope=scope) as stats:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = _route(scope)
+                db_queries.labels(route).inc(stats.count)
+                db_query_seconds.labels(route).inc(stats.duration)
+
+
+class RequestMetricsMiddleware:
+    """Count requests and time them per route."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+            await send(message)
+
+        http_requests_in_progress.inc()
+        started = perf_counter()
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            http_requests_in_progress.dec()
+            route = _route(scope)
+            method = scope['method']
+            http_request_duration.labels(method, route).observe(elapsed)
+            http_requests.labels(method, route, str(status)).inc()
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[..., Awaitable[None]]
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    func: JobFunc
+    args: tuple
+
+
+class JobQueue:
+    """In-process queue of deferred work run by a few worker tasks.
+
+    A job is a coroutine function called as `func(session, *args)` with a
+    fresh session per attempt. Failed attempts are retried with
+    exponential backoff; jobs still queued on shutdown get a grace period.
+    Jobs live in memory only, so work queued when the process dies is lost
+    and must be safe to redo or to leave undone.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        max_attempts: int,
+        retry_delay: float,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_pending)
+        self._tasks: list[asyncio.Task] = []
+        self._session_factory: async_sessionmaker[AsyncSession] | None = None
+
+    def start(self, session_factory: async_sessionmaker[AsyncSession]):
+        self._session_factory = session_factory
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float) -> None:
+        """Give queued jobs `timeout` seconds to finish, then cancel."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except TimeoutError:
+            logger.warning(
+                'Stopping with %d jobs still queued', self._queue.qsize()
+            )
+
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._session_factory = None
+
+    def enqueue(self, func: JobFunc, *args) -> None:
+        """Queue `func(session, *args)`, or fail fast with 503 when full."""
+        try:
+            self._queue.put_nowait(Job(func, args))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server is busy, try again later',
+                headers={'Retry-After': '1'},
+            )
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished or given up."""
+        await self._queue.join()
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with self._session_factory() as session:
+                    await job.func(session, *job.args)
+                return
+            except Exception:
+                if attempt == self.max_attempts:
+                    logger.exception(
+                        'Job %s failed after %d attempts',
+                        job.func.__name__,
+                        attempt,
+                    )
+                    return
+
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+
+job_queue = JobQueue(
+    workers=get_settings().JOBS_WORKERS,
+    max_pending=get_settings().JOBS_MAX_PENDING,
+    max_attempts=get_settings().JOBS_MAX_ATTEMPTS,
+    retry_delay=get_settings().JOBS_RETRY_DELAY_SECONDS,
+)
@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from copy import copy
+from typing import Self
+
+# Metrics are only ever updated from the event loop thread, so plain
+# arithmetic needs no locks.
+
+Sample = tuple[str, tuple[tuple[str, str], ...], float]
+
+
+class Metric:
+    """A named value the process reports about itself.
+
+    A metric declared with `labelnames` is reported through its children,
+    one per combination of label values passed to `labels`.
+    """
+
+    kind = 'untyped'
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._reset()
+        registry.append(self)
+
+    def _reset(self) -> None:
+        self.value: float = 0
+        self.children: dict[tuple[str, ...], Self] = {}
+
+    def labels(self, *values: str) -> Self:
+        child = self.children.get(values)
+
+        if child is None:
+            child = copy(self)
+            child._reset()
+            self.children[values] = child
+
+        return child
+
+    def samples(self, labels: tuple[tuple[str, str], ...]) -> Iterator[Sample]:
+        yield self.name, labels, self.value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+
+class Histogram(Metric):
+    """Counts observations into buckets by upper bound, in seconds."""
+
+    kind = 'histogram'
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def _reset(self) -> None:
+        super()._reset()
+        # One slot per bucket plus +Inf; made cumulative only when rendered.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, labels: tuple[tuple[str, str], ...]) -> Iterator[Sample]:
+        cumulative = 0
+
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield (
+                f'{self.name}_bucket',
+                (*labels, ('le', str(bound))),
+                cumulative,
+            )
+
+        yield f'{self.name}_sum', labels, self.sum
+        yield f'{self.name}_count', labels, cumulative
+
+
+registry: list[Metric] = []
+_collectors: list[Callable[[], None]] = []
+
+
+def on_collect(collector: Callable[[], None]) -> Callable[[], None]:
+    """Register `collector` to refresh gauges right before each render."""
+    _collectors.append(collector)
+    return collector
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    for collector in _collectors:
+        collector()
+
+    lines = []
+
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        children = (
+            metric.children.items() if metric.labelnames else [((), metric)]
+        )
+
+        for values, child in children:
+            labels = tuple(zip(metric.labelnames, values))
+
+            for name, sample_labels, value in child.samples(labels):
+                lines.append(f'{name}{_format_labels(sample_labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
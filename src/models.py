@@ -1,11 +1,16 @@
 from datetime import datetime
 from uuid import UUID, uuid7
 
-from sqlalchemy import ForeignKey, String, func
+from sqlalchemy import ForeignKey, Index, String, func, text
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 from src.enums import ToDoStatus
-from src.security.hash import hash_password, verify_password
+from src.security.hash import (
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_password_async,
+)
 
 table_register = registry()
 
@@ -19,6 +24,10 @@ class User:
     )
     username: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str]
+    # Bumped to revoke every token issued so far (e.g. on password change).
+    token_version: Mapped[int] = mapped_column(
+        default=0, server_default='0', init=False
+    )
     created_at: Mapped[datetime] = mapped_column(
         server_default=func.now(),
         init=False,
@@ -27,23 +36,49 @@ class User:
         server_default=func.now(), onupdate=func.now(), init=False
     )
 
+    # Optimistic-concurrency counter, surfaced to clients as the ETag.
+    version: Mapped[int] = mapped_column(server_default='1', init=False)
+
     todos: Mapped[list['ToDo']] = relationship(
         init=False,
         back_populates='user',
         cascade='all, delete-orphan',
-        lazy='selectin',
+        lazy='raise',
+        # The database deletes a user's todos (ON DELETE CASCADE), so the
+        # ORM never loads them just to delete them one by one.
+        passive_deletes=True,
     )
 
+    __mapper_args__ = {'eager_defaults': True, 'version_id_col': version}
+
     def hash_password(self):
         self.password = hash_password(self.password)
 
     def verify_password(self, password: str) -> bool:
         return verify_password(password, self.password)
 
+    async def hash_password_async(self):
+        self.password = await hash_password_async(self.password)
+
+    async def verify_password_async(self, password: str) -> bool:
+        return await verify_password_async(password, self.password)
+
 
 @table_register.mapped_as_dataclass()
 class ToDo:
     __tablename__ = 'todos'
+    __table_args__ = (
+        Index('ix_todos_user_id_id', 'user_id', 'id'),
+        Index('ix_todos_user_id_status_id', 'user_id', 'status', 'id'),
+        Index('ix_todos_status_updated_at', 'status', 'updated_at'),
+        Index(
+            'ix_todos_user_id_done_at',
+            'user_id',
+            'done_at',
+            sqlite_where=text('done_at IS NOT NULL'),
+            postgresql_where=text('done_at IS NOT NULL'),
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(
         primary_key=True, default_factory=uuid7, init=False
@@ -59,6 +94,72 @@ class ToDo:
         server_default=func.now(), onupdate=func.now(), init=False
     )
     done_at: Mapped[datetime | None] = mapped_column(nullable=True, init=False)
+    # Only ORM flushes bump this; UPDATE statements must do it themselves.
+    version: Mapped[int] = mapped_column(server_default='1', init=False)
 
-    user_id: Mapped[UUID] = mapped_column(ForeignKey(User.id))
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey(User.id, ondelete='CASCADE')
+    )
     user: Mapped[User] = relationship(back_populates='todos', init=False)
+
+    __mapper_args__ = {'eager_defaults': True, 'version_id_col': version}
+
+
+@table_register.mapped_as_dataclass()
+class RevokedToken:
+    __tablename__ = 'revoked_tokens'
+
+    jti: Mapped[str] = mapped_column(primary_key=True)
+    expires_at: Mapped[datetime]
+
+
+@table_register.mapped_as_dataclass()
+class ToDoStatusCount:
+    """How many of a user's todos are in each status, kept by triggers."""
+
+    __tablename__ = 'todo_status_counts'
+
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey(User.id, ondelete='CASCADE'), primary_key=True
+    )
+    status: Mapped[ToDoStatus] = mapped_column(String(), primary_key=True)
+    count: Mapped[int] = mapped_column(default=0, server_default='0')
+
+
+@table_register.mapped_as_dataclass()
+class ToDoChange:
+    """Latest change to a todo, numbered per user; a tombstone once deleted.
+
+    Written by triggers on `todos`, one row per todo ever created.
+    """
+
+    __tablename__ = 'todo_changes'
+    __table_args__ = (
+        Index('ix_todo_changes_user_id_seq', 'user_id', 'seq', unique=True),
+    )
+
+    todo_id: Mapped[UUID] = mapped_column(primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey(User.id, ondelete='CASCADE')
+    )
+    seq: Mapped[int]
+    deleted: Mapped[bool] = mapped_column(default=False, server_default='0')
+    changed_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(), init=False
+    )
+
+
+@table_register.mapped_as_dataclass()
+class ToDoChangeHorizon:
+    """Newest tombstone pruned from a user's changes.
+
+    A sync token below it may have missed that deletion, so its client has
+    to sync again from scratch.
+    """
+
+    __tablename__ = 'todo_change_horizons'
+
+    user_id: Mapped[UUID] = mapped_column(
+        ForeignKey(User.id, ondelete='CASCADE'), primary_key=True
+    )
+    seq: Mapped[int]
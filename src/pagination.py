@@ -0,0 +1,19 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from uuid import UUID
+
+from fastapi import HTTPException
+
+
+def encode_cursor(last_id: UUID) -> str:
+    """Encode the id of the last row of a page as an opaque cursor."""
+    return urlsafe_b64encode(last_id.bytes).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> UUID:
+    """Decode a cursor produced by `encode_cursor` back into a row id."""
+    padding = '=' * (-len(cursor) % 4)
+
+    try:
+        return UUID(bytes=urlsafe_b64decode(cursor + padding))
+    except ValueError:
+        raise HTTPException(400, 'Invalid cursor')
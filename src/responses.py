@@ -0,0 +1,39 @@
+from collections.abc import Mapping
+from functools import cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@cache
+def _adapter(schema: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+class ModelResponse(Response):
+    """JSON body validated against `schema` and encoded by pydantic-core.
+
+    Returning this instead of a dict skips FastAPI's `response_model` pass
+    (validate, dump to Python objects, then `json.dumps`): ORM attributes
+    are read once and written straight to bytes. Keep `response_model` on
+    the route for the OpenAPI schema.
+    """
+
+    media_type = 'application/json'
+
+    def __init__(
+        self,
+        schema: type[BaseModel],
+        content: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+    ):
+        self.schema = schema
+        super().__init__(content, status_code, headers)
+
+    def render(self, content: Any) -> bytes:
+        adapter = _adapter(self.schema)
+        return adapter.dump_json(
+            adapter.validate_python(content), by_alias=True
+        )
@@ -6,9 +6,18 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import select
 
 from src.db import Session
+from src.etags import Conditional, not_modified, row_etag
 from src.models import User
-from src.schemas import TokenResponse, UserResponse
-from src.security.auth import CurrentUser, create_access_token
+from src.responses import ModelResponse
+from src.schemas import MessageResponse, TokenResponse, UserResponse
+from src.security.auth import (
+    CurrentPrincipal,
+    CurrentUser,
+    create_access_token,
+    token_claims,
+    token_versions,
+)
+from src.security.revocation import revocation_list
 
 router = APIRouter(
     prefix='/auth',
@@ -18,8 +27,17 @@ OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
 @router.get('/me', response_model=UserResponse)
-async def get_current_user(user: CurrentUser):
-    return dict(data=user)
+async def get_current_user(user: CurrentUser, conditional: Conditional):
+    etag = row_etag(user.id, user.version)
+
+    if conditional.is_fresh(etag):
+        return not_modified(etag)
+
+    conditional.set_etag(etag)
+
+    return ModelResponse(
+        UserResponse, dict(data=user), headers=conditional.headers
+    )
 
 
 @router.post('/token', response_model=TokenResponse)
@@ -30,19 +48,34 @@ async def login_for_access_token(form_data: OAuth2Form, session: Session):
 
     user = user.scalar_one_or_none()
 
-    if user is None or not user.verify_password(form_data.password):
+    if user is None or not await user.verify_password_async(
+        form_data.password
+    ):
         raise HTTPException(
             status_code=HTTPStatus.UNAUTHORIZED,
             detail='Incorrect username or password',
         )
 
-    access_token = create_access_token(data={'sub': str(user.id)})
+    token_versions.set(str(user.id), user.token_version)
+    access_token = create_access_token(data=token_claims(user))
 
     return {'access_token': access_token, 'token_type': 'bearer'}
 
 
 @router.post('/refresh_token', response_model=TokenResponse)
 async def refresh_access_token(user: CurrentUser):
-    new_access_token = create_access_token(data={'sub': str(user.id)})
+    new_access_token = create_access_token(data=token_claims(user))
 
     return {'access_token': new_access_token, 'token_type': 'bearer'}
+
+
+@router.post('/logout', response_model=MessageResponse)
+async def logout(principal: CurrentPrincipal, session: Session):
+    if principal.token_id is None or principal.expires_at is None:
+        raise HTTPException(400, 'Token cannot be revoked')
+
+    await revocation_list.revoke(
+        session, principal.token_id, principal.expires_at
+    )
+
+    return dict(message='Logged out')
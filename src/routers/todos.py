@@ -1,32 +1,162 @@
+import asyncio
+import csv
+import io
 import uuid
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException, Query
-from sqlalchemy import func, select
+from fastapi import (
+    APIRouter,
+    Body,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import (
+    String,
+    case,
+    cast,
+    delete,
+    exists,
+    func,
+    insert,
+    select,
+    update,
+)
 
-from src.db import Session
+from src.db import ReadSession, Session
+from src.enums import ToDoStatus
+from src.etags import (
+    Conditional,
+    digest_etag,
+    not_modified,
+    precondition_failed,
+    row_etag,
+)
+from src.events import Event, broker, sse_stream
+from src.jobs import job_queue
 from src.models import ToDo
+from src.pagination import decode_cursor, encode_cursor
+from src.responses import ModelResponse
 from src.schemas import (
+    BulkResult,
     FilterToDo,
     MessageResponse,
+    ToDoBulkUpdateInput,
+    ToDoChanges,
     ToDoCreateInput,
     ToDoList,
     ToDoResponse,
+    ToDoSchema,
+    ToDoStatsResponse,
     ToDoUpdateInput,
 )
-from src.security.auth import CurrentUser
+from src.search import search_todos
+from src.security.auth import CurrentPrincipal, get_current_principal
+from src.settings import get_settings
+from src.stats import status_counts
+from src.sync import changes_horizon, changes_since
+from src.tasks import purge_trash
 
 router = APIRouter(
     prefix='/todos',
     tags=['ToDos'],
 )
+BulkBody = Body(min_length=1, max_length=get_settings().TODOS_BULK_MAX_ITEMS)
+
+
+def _done_at(values: dict):
+    """SQL value for `done_at` once the update in `values` is applied."""
+    if 'status' in values:
+        return func.now() if values['status'] == ToDoStatus.DONE else None
+
+    return case((ToDo.status == ToDoStatus.DONE, func.now()), else_=None)
+
+
+async def _list_etag(session, user_id: uuid.UUID, todo_filter: FilterToDo):
+    # Creating a todo raises max(id) (ids are uuid7), deleting one lowers
+    # the count and every update bumps a version, so any write changes this
+    # without reading the rows themselves.
+    summary = await session.execute(
+        select(
+            func.count(),
+            func.max(ToDo.updated_at),
+            func.max(cast(ToDo.id, String)),
+            func.sum(ToDo.version),
+        ).where(ToDo.user_id == user_id)
+    )
+    return digest_etag(*summary.one(), todo_filter.model_dump_json())
+
+
+def _publish(user_id: uuid.UUID, event_type: str, todos) -> None:
+    # Nothing is encoded unless someone is listening.
+    if not broker.has_subscribers(user_id):
+        return
+
+    for todo in todos:
+        data = ToDoSchema.model_validate(todo).model_dump_json(by_alias=True)
+        broker.publish(user_id, Event(event_type, data))
+
+
+def _publish_deleted(user_id: uuid.UUID, todo_ids) -> None:
+    for todo_id in todo_ids:
+        broker.publish(user_id, Event('deleted', f'{{"id":"{todo_id}"}}'))
+
+
+async def _send_events(websocket: WebSocket, user_id: uuid.UUID):
+    keepalive = get_settings().EVENTS_KEEPALIVE_SECONDS
+
+    with broker.subscribe(user_id) as subscription:
+        while True:
+            try:
+                event = await subscription.get(keepalive)
+            except TimeoutError:
+                await websocket.send_text('{"type":"keepalive"}')
+                continue
+            except asyncio.QueueShutDown:
+                break
+
+            await websocket.send_text(event.json())
+
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+async def _ndjson_chunks(todos):
+    async for partition in todos.partitions():
+        yield ''.join(
+            ToDoSchema.model_validate(todo).model_dump_json(by_alias=True)
+            + '\n'
+            for todo in partition
+        )
+
+
+async def _csv_chunks(todos):
+    fields = [field.alias for field in ToDoSchema.model_fields.values()]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+
+    async for partition in todos.partitions():
+        writer.writerows(
+            ToDoSchema.model_validate(todo).model_dump(
+                mode='json', by_alias=True
+            )
+            for todo in partition
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
 
 
 @router.post('/', response_model=ToDoResponse)
 async def create_todo(
     session: Session,
     data: ToDoCreateInput,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
+    conditional: Conditional,
 ):
     todo = ToDo(
         title=data.title,
@@ -37,17 +167,29 @@ async def create_todo(
 
     session.add(todo)
     await session.commit()
-    await session.refresh(todo)
+    conditional.set_etag(row_etag(todo.id, todo.version))
+    _publish(current_user.id, 'created', [todo])
 
-    return dict(data=todo)
+    return ModelResponse(
+        ToDoResponse, dict(data=todo), headers=conditional.headers
+    )
 
 
 @router.get('/', response_model=ToDoList)
 async def list_todos(
-    session: Session,
-    current_user: CurrentUser,
+    session: ReadSession,
+    current_user: CurrentPrincipal,
     todo_filter: Annotated[FilterToDo, Query()],
+    conditional: Conditional,
 ):
+    # Computed before the rows are read, so a write landing in between
+    # leaves an older ETag that just fails to match on the next poll.
+    etag = await _list_etag(session, current_user.id, todo_filter)
+
+    if conditional.is_fresh(etag):
+        return not_modified(etag)
+
+    conditional.set_etag(etag)
     query = select(ToDo).where(ToDo.user_id == current_user.id)
 
     if todo_filter.title is not None:
@@ -61,44 +203,300 @@ async def list_todos(
     if todo_filter.status is not None:
         query = query.filter(ToDo.status == todo_filter.status)
 
-    todos = await session.scalars(query)
-    return dict(data=todos.all())
+    if todo_filter.q is not None:
+        if todo_filter.after is not None:
+            raise HTTPException(400, 'Search results cannot use a cursor')
+
+        query = search_todos(query, todo_filter.q, session.bind.dialect.name)
+    else:
+        # ids are uuid7, so ordering by id is ordering by creation time and
+        # the cursor is a plain `id > last_id` seek, not an OFFSET scan.
+        query = query.order_by(ToDo.id)
+
+        if todo_filter.after is not None:
+            query = query.filter(ToDo.id > decode_cursor(todo_filter.after))
+
+    if todo_filter.limit is not None:
+        query = query.limit(todo_filter.limit + 1)
+
+    todos = (await session.scalars(query)).all()
+    next_cursor = None
+
+    if todo_filter.limit is not None and len(todos) > todo_filter.limit:
+        todos = todos[: todo_filter.limit]
+
+        if todo_filter.q is None:
+            next_cursor = encode_cursor(todos[-1].id)
+
+    return ModelResponse(
+        ToDoList,
+        dict(data=todos, next_cursor=next_cursor),
+        headers=conditional.headers,
+    )
+
+
+@router.get('/export', response_class=StreamingResponse)
+async def export_todos(
+    session: ReadSession,
+    current_user: CurrentPrincipal,
+    export_format: Annotated[
+        Literal['ndjson', 'csv'], Query(alias='format')
+    ] = 'ndjson',
+):
+    # Rows are fetched through a server-side cursor in `yield_per` batches
+    # and written out batch by batch, so memory stays flat however many
+    # todos the user has.
+    todos = await session.stream_scalars(
+        select(ToDo)
+        .where(ToDo.user_id == current_user.id)
+        .order_by(ToDo.id)
+        .execution_options(yield_per=get_settings().TODOS_EXPORT_BATCH_SIZE)
+    )
+
+    if export_format == 'csv':
+        return StreamingResponse(
+            _csv_chunks(todos),
+            media_type='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=todos.csv'},
+        )
+
+    return StreamingResponse(
+        _ndjson_chunks(todos), media_type='application/x-ndjson'
+    )
+
+
+@router.get('/events', response_class=StreamingResponse)
+async def todo_events(session: Session, current_user: CurrentPrincipal):
+    # Release the connection the token check used; the stream may stay
+    # open for hours.
+    await session.commit()
+
+    return StreamingResponse(
+        sse_stream(current_user.id, get_settings().EVENTS_KEEPALIVE_SECONDS),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.websocket('/events/ws')
+async def todo_events_ws(websocket: WebSocket, session: Session, token: str):
+    # Browsers cannot set headers on a WebSocket, so the token comes in the
+    # query string.
+    try:
+        current_user = await get_current_principal(session, token)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+    await session.commit()
+    await websocket.accept()
+    sender = asyncio.create_task(_send_events(websocket, current_user.id))
+
+    # Clients have nothing to say; reading is how a disconnect is noticed.
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+@router.get(
+    '/changes',
+    response_model=ToDoChanges,
+    responses={
+        410: {
+            'description': 'The sync token is older than the retained '
+            'changes; sync again without `since`.'
+        }
+    },
+)
+async def todo_changes(
+    session: ReadSession,
+    current_user: CurrentPrincipal,
+    since: Annotated[int, Query(ge=0, le=2**63 - 1)] = 0,
+    limit: Annotated[int, Query(gt=0, le=500)] = 100,
+):
+    # `since` is the `syncToken` of the previous response, 0 the first time.
+    changes = await changes_since(session, current_user.id, since, limit + 1)
+
+    # Checked after reading, so a tombstone pruned in between still counts.
+    if 0 < since < await changes_horizon(session, current_user.id):
+        raise HTTPException(410, 'Sync token expired, sync again from scratch')
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    return ModelResponse(
+        ToDoChanges,
+        dict(
+            data=[todo for _, _, todo in changes if todo is not None],
+            deleted=[todo_id for _, todo_id, todo in changes if todo is None],
+            sync_token=changes[-1][0] if changes else since,
+            has_more=has_more,
+        ),
+    )
+
+
+@router.get('/stats', response_model=ToDoStatsResponse)
+async def todo_stats(session: ReadSession, current_user: CurrentPrincipal):
+    counts = await status_counts(session, current_user.id)
+
+    # Drafts and trashed todos are not work anyone committed to finishing.
+    committed = sum(
+        counts[status]
+        for status in (ToDoStatus.TODO, ToDoStatus.DOING, ToDoStatus.DONE)
+    )
+    completed = counts[ToDoStatus.DONE]
+
+    return dict(
+        data=dict(
+            total=sum(counts.values()),
+            by_status=counts,
+            completed=completed,
+            completion_rate=completed / committed if committed else 0.0,
+        )
+    )
+
+
+@router.post('/bulk', response_model=ToDoList)
+async def create_todos_bulk(
+    session: Session,
+    data: Annotated[list[ToDoCreateInput], BulkBody],
+    current_user: CurrentPrincipal,
+):
+    todos = await session.scalars(
+        insert(ToDo).returning(ToDo, sort_by_parameter_order=True),
+        [
+            dict(id=uuid.uuid7(), user_id=current_user.id, **item.model_dump())
+            for item in data
+        ],
+    )
+    todos = todos.all()
+    await session.commit()
+    _publish(current_user.id, 'created', todos)
+
+    return ModelResponse(ToDoList, dict(data=todos))
+
+
+@router.patch('/bulk', response_model=BulkResult)
+async def patch_todos_bulk(
+    session: Session,
+    data: Annotated[list[ToDoBulkUpdateInput], BulkBody],
+    current_user: CurrentPrincipal,
+):
+    # Items carrying the same changes share one `UPDATE ... WHERE id IN`.
+    groups: dict[tuple, list[uuid.UUID]] = {}
+    for item in data:
+        changes = item.model_dump(exclude_unset=True, exclude={'id'})
+        groups.setdefault(tuple(sorted(changes.items())), []).append(item.id)
+
+    updated = {}
+    for changes, ids in groups.items():
+        values = dict(changes)
+        values['done_at'] = _done_at(values)
+        values['version'] = ToDo.version + 1
+
+        result = await session.scalars(
+            update(ToDo)
+            .where(ToDo.id.in_(ids), ToDo.user_id == current_user.id)
+            .values(**values)
+            .returning(ToDo)
+        )
+        updated.update((todo.id, todo) for todo in result.all())
+
+    await session.commit()
+    _publish(current_user.id, 'updated', updated.values())
+
+    return dict(
+        data=[
+            dict(
+                id=item.id,
+                result='updated' if item.id in updated else 'not_found',
+            )
+            for item in data
+        ]
+    )
+
+
+@router.delete('/bulk', response_model=BulkResult)
+async def delete_todos_bulk(
+    session: Session,
+    ids: Annotated[list[uuid.UUID], BulkBody],
+    current_user: CurrentPrincipal,
+):
+    deleted = await session.scalars(
+        delete(ToDo)
+        .where(ToDo.id.in_(ids), ToDo.user_id == current_user.id)
+        .returning(ToDo.id)
+    )
+    deleted = set(deleted.all())
+    await session.commit()
+    _publish_deleted(current_user.id, deleted)
+
+    return dict(
+        data=[
+            dict(
+                id=todo_id,
+                result='deleted' if todo_id in deleted else 'not_found',
+            )
+            for todo_id in ids
+        ]
+    )
+
+
+@router.delete('/trash', status_code=202, response_model=MessageResponse)
+async def empty_trash(current_user: CurrentPrincipal):
+    job_queue.enqueue(purge_trash, current_user.id)
+
+    return dict(message='Trash will be emptied shortly.')
 
 
 @router.patch('/{todo_id}', response_model=ToDoResponse)
 async def patch_todo(
     todo_id: uuid.UUID,
     session: Session,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
     data: ToDoUpdateInput,
+    conditional: Conditional,
 ):
-    todo = await session.scalar(
-        select(ToDo).where(ToDo.id == todo_id, ToDo.user_id == current_user.id)
-    )
+    values = data.model_dump(exclude_unset=True)
+    values['done_at'] = _done_at(values)
+    values['version'] = ToDo.version + 1
+    owned = (ToDo.id == todo_id, ToDo.user_id == current_user.id)
+    query = update(ToDo).where(*owned)
+    versions = conditional.matched_versions(todo_id)
 
-    if todo is None:
-        raise HTTPException(404, 'Task not found')
+    # The version check is part of the UPDATE itself, so two clients
+    # holding the same ETag cannot both win.
+    if versions is not None:
+        query = query.where(ToDo.version.in_(versions))
 
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(todo, key, value)
+    todo = await session.scalar(query.values(**values).returning(ToDo))
 
-    if todo.status == 'done':
-        todo.done_at = func.now()
-    else:
-        todo.done_at = None
+    if todo is None:
+        if versions is not None and await session.scalar(
+            select(exists().where(*owned))
+        ):
+            raise precondition_failed()
+
+        raise HTTPException(404, 'Task not found')
 
-    session.add(todo)
     await session.commit()
-    await session.refresh(todo)
+    conditional.set_etag(row_etag(todo.id, todo.version))
+    _publish(current_user.id, 'updated', [todo])
 
-    return dict(data=todo)
+    return ModelResponse(
+        ToDoResponse, dict(data=todo), headers=conditional.headers
+    )
 
 
 @router.delete('/{todo_id}', response_model=MessageResponse)
 async def delete_todo(
     todo_id: uuid.UUID,
     session: Session,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
 ):
     todo = await session.scalar(
         select(ToDo).where(ToDo.id == todo_id, ToDo.user_id == current_user.id)
@@ -109,5 +507,6 @@ async def delete_todo(
 
     await session.delete(todo)
     await session.commit()
+    _publish_deleted(current_user.id, [todo_id])
 
     return dict(message='Task has been deleted successfully.')
@@ -1,18 +1,30 @@
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import exists, select
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import delete, exists, select
+from sqlalchemy.orm.exc import StaleDataError
 
-from src.db import Session
+from src.db import ReadSession, Session
+from src.etags import (
+    Conditional,
+    not_modified,
+    precondition_failed,
+    row_etag,
+)
 from src.models import User
+from src.pagination import decode_cursor, encode_cursor
+from src.responses import ModelResponse
 from src.schemas import (
+    FilterUser,
     MessageResponse,
     UserCreateInput,
     UserList,
     UserResponse,
     UserUpdateInput,
 )
-from src.security.auth import CurrentUser
+from src.search import username_prefix
+from src.security.auth import CurrentPrincipal, invalidate_user
 
 router = APIRouter(
     prefix='/users',
@@ -21,21 +33,51 @@ router = APIRouter(
 
 
 @router.get('/', response_model=UserList)
-async def index_users(session: Session):
-    list_users = await session.execute(select(User))
-    list_users = list_users.scalars().all()
-    return dict(data=list_users)
+async def index_users(
+    session: ReadSession, user_filter: Annotated[FilterUser, Query()]
+):
+    query = select(User).order_by(User.id).limit(user_filter.limit + 1)
+
+    if user_filter.username is not None:
+        query = query.where(
+            username_prefix(user_filter.username, session.bind.dialect.name)
+        )
+
+    if user_filter.after is not None:
+        query = query.where(User.id > decode_cursor(user_filter.after))
+
+    list_users = (await session.scalars(query)).all()
+    next_cursor = None
+
+    if len(list_users) > user_filter.limit:
+        list_users = list_users[: user_filter.limit]
+        next_cursor = encode_cursor(list_users[-1].id)
+
+    return ModelResponse(
+        UserList, dict(data=list_users, next_cursor=next_cursor)
+    )
 
 
 @router.get('/{user_id}', response_model=UserResponse)
-async def get_user(user_id: UUID, session: Session):
+async def get_user(
+    user_id: UUID, session: ReadSession, conditional: Conditional
+):
     user = await session.execute(select(User).where(User.id == user_id))
     user = user.scalar_one_or_none()
 
     if user is None:
         raise HTTPException(404, 'User not found')
 
-    return dict(data=user)
+    etag = row_etag(user.id, user.version)
+
+    if conditional.is_fresh(etag):
+        return not_modified(etag)
+
+    conditional.set_etag(etag)
+
+    return ModelResponse(
+        UserResponse, dict(data=user), headers=conditional.headers
+    )
 
 
 @router.post('/', status_code=201, response_model=UserResponse)
@@ -50,11 +92,10 @@ async def create_user(data: UserCreateInput, session: Session):
         raise HTTPException(409, 'Username not available')
 
     user = User(**data.model_dump())
-    user.hash_password()
+    await user.hash_password_async()
     session.add(user)
     await session.commit()
-    await session.refresh(user)
-    return dict(data=user)
+    return ModelResponse(UserResponse, dict(data=user), status_code=201)
 
 
 @router.put('/{user_id}', response_model=UserResponse)
@@ -62,7 +103,8 @@ async def update_user(
     user_id: UUID,
     data: UserUpdateInput,
     session: Session,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
+    conditional: Conditional,
 ):
     user = await session.execute(select(User).where(User.id == user_id))
     user = user.scalar_one_or_none()
@@ -73,6 +115,11 @@ async def update_user(
     if current_user.id != user_id:
         raise HTTPException(403, 'Forbidden')
 
+    versions = conditional.matched_versions(user_id)
+
+    if versions is not None and user.version not in versions:
+        raise precondition_failed()
+
     if data.username is not None and data.username != user.username:
         username_already_taken = (
             await session.execute(
@@ -90,31 +137,49 @@ async def update_user(
         setattr(user, key, value)
 
     if data.password is not None:
-        user.hash_password()
+        await user.hash_password_async()
+        user.token_version += 1
 
     session.add(user)
-    await session.commit()
-    await session.refresh(user)
 
-    return dict(data=user)
+    # The UPDATE is guarded by the version read above (`version_id_col`),
+    # so a concurrent write since then fails it instead of being lost.
+    try:
+        await session.commit()
+    except StaleDataError:
+        await session.rollback()
+        raise precondition_failed()
+
+    invalidate_user(user_id)
+    conditional.set_etag(row_etag(user.id, user.version))
+
+    return ModelResponse(
+        UserResponse, dict(data=user), headers=conditional.headers
+    )
 
 
 @router.delete('/{user_id}', response_model=MessageResponse)
 async def delete_user(
     user_id: UUID,
     session: Session,
-    current_user: CurrentUser,
+    current_user: CurrentPrincipal,
 ):
-    user = await session.execute(select(User).where(User.id == user_id))
-    user = user.scalar_one_or_none()
+    if current_user.id != user_id:
+        if await session.scalar(select(exists().where(User.id == user_id))):
+            raise HTTPException(403, 'Forbidden')
 
-    if user is None:
         raise HTTPException(404, 'User not found')
 
-    if current_user.id != user_id:
-        raise HTTPException(403, 'Forbidden')
+    # One statement however many todos the user has: the database cascades
+    # to their todos, status counts and change log.
+    deleted = await session.scalar(
+        delete(User).where(User.id == user_id).returning(User.id)
+    )
+
+    if deleted is None:
+        raise HTTPException(404, 'User not found')
 
-    await session.delete(user)
     await session.commit()
+    invalidate_user(user_id)
 
     return dict(message='User deleted')
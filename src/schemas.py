@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from pydantic.alias_generators import to_camel
 
 from src.enums import ToDoStatus
@@ -45,6 +46,13 @@ class UserResponse(BasicModel):
 
 class UserList(BasicModel):
     data: list[UserSchema]
+    next_cursor: str | None = None
+
+
+class FilterUser(BasicModel):
+    username: str | None = Field(default=None, min_length=1)
+    limit: int = Field(default=50, gt=0, le=100)
+    after: str | None = None
 
 
 class ToDoCreateInput(BasicModel):
@@ -59,6 +67,10 @@ class ToDoUpdateInput(BasicModel):
     status: ToDoStatus | None = None
 
 
+class ToDoBulkUpdateInput(ToDoUpdateInput):
+    id: uuid.UUID
+
+
 class ToDoSchema(BasicModel):
     id: uuid.UUID
     title: str
@@ -76,9 +88,43 @@ class ToDoResponse(BasicModel):
 
 class ToDoList(BasicModel):
     data: list[ToDoSchema]
+    next_cursor: str | None = None
+
+
+class ToDoChanges(BasicModel):
+    data: list[ToDoSchema]
+    deleted: list[uuid.UUID]
+    sync_token: int
+    has_more: bool
+
+
+class ToDoStats(BasicModel):
+    total: int
+    by_status: dict[ToDoStatus, int]
+    completed: int
+    completion_rate: float
+
+
+class ToDoStatsResponse(BasicModel):
+    data: ToDoStats
+
+
+class BulkResultItem(BasicModel):
+    id: uuid.UUID
+    result: Literal['updated', 'deleted', 'not_found']
+
+
+class BulkResult(BasicModel):
+    data: list[BulkResultItem]
 
 
 class FilterToDo(BasicModel):
     title: str | None = None
     description: str | None = None
     status: ToDoStatus | None = None
+    q: (
+        Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+        | None
+    ) = None
+    limit: int | None = Field(default=None, gt=0, le=100)
+    after: str | None = None
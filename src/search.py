@@ -0,0 +1,150 @@
+import sys
+
+from sqlalchemy import (
+    DDL,
+    ColumnElement,
+    Select,
+    and_,
+    column,
+    event,
+    func,
+    literal_column,
+    or_,
+    table,
+)
+
+from src.models import ToDo, User
+
+# External-content FTS5 table sharing its rowid with `todos`. VACUUM may
+# renumber those rowids, so run `INSERT INTO todos_fts(todos_fts)
+# VALUES ('rebuild')` after one.
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE todos_fts USING fts5(
+        title, description, content='todos', content_rowid='rowid'
+    )
+    """,
+    """
+    CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todos_fts_au AFTER UPDATE OF title, description ON todos
+    BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, title, description)
+        VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO todos_fts(rowid, title, description)
+        VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+]
+
+# Queries must repeat this exact expression to hit the GIN index.
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', "
+    "coalesce(title, '') || ' ' || coalesce(description, ''))"
+)
+
+POSTGRES_DDL = [
+    f'CREATE INDEX ix_todos_search ON todos USING gin ({POSTGRES_DOCUMENT})',
+]
+
+# Username prefix ranges compare in byte order. SQLite's unique index on
+# `username` already sorts that way; PostgreSQL needs a "C" collated one.
+POSTGRES_USERS_DDL = [
+    'CREATE INDEX ix_users_username_c ON users (username COLLATE "C")',
+]
+
+for statement in SQLITE_DDL:
+    event.listen(
+        ToDo.__table__,
+        'after_create',
+        DDL(statement).execute_if(dialect='sqlite'),
+    )
+
+event.listen(
+    ToDo.__table__,
+    'after_drop',
+    DDL('DROP TABLE IF EXISTS todos_fts').execute_if(dialect='sqlite'),
+)
+
+for statement in POSTGRES_DDL:
+    event.listen(
+        ToDo.__table__,
+        'after_create',
+        DDL(statement).execute_if(dialect='postgresql'),
+    )
+
+for statement in POSTGRES_USERS_DDL:
+    event.listen(
+        User.__table__,
+        'after_create',
+        DDL(statement).execute_if(dialect='postgresql'),
+    )
+
+
+def _fts5_query(terms: str) -> str:
+    """Quote every word so user input is never parsed as FTS5 syntax."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in terms.split()
+    )
+
+
+def search_todos(query: Select, terms: str, dialect: str) -> Select:
+    """Restrict `query` to todos matching `terms`, best matches first."""
+    if dialect == 'sqlite':
+        todos_fts = table('todos_fts', column('rowid'))
+        fts_row = literal_column('todos_fts')
+        return (
+            query
+            .join(
+                todos_fts, todos_fts.c.rowid == literal_column('todos.rowid')
+            )
+            .where(fts_row.match(_fts5_query(terms)))
+            .order_by(func.bm25(fts_row), ToDo.id)
+        )
+
+    if dialect == 'postgresql':
+        document = literal_column(POSTGRES_DOCUMENT)
+        ts_query = func.websearch_to_tsquery('simple', terms)
+        return query.where(document.bool_op('@@')(ts_query)).order_by(
+            func.ts_rank(document, ts_query).desc(), ToDo.id
+        )
+
+    return query.where(
+        or_(ToDo.title.contains(terms), ToDo.description.contains(terms))
+    ).order_by(ToDo.id)
+
+
+SURROGATES = (0xD800, 0xDFFF)
+
+
+def username_prefix(prefix: str, dialect: str) -> ColumnElement[bool]:
+    """Match usernames starting with `prefix` as a range an index serves."""
+    username = User.username
+
+    if dialect == 'postgresql':
+        username = username.collate('C')
+
+    # The smallest string greater than every string starting with `prefix`.
+    stem = prefix.rstrip(chr(sys.maxunicode))
+
+    if not stem:
+        return username >= prefix
+
+    following = ord(stem[-1]) + 1
+
+    # Surrogates cannot be encoded, and no username holds one anyway.
+    if SURROGATES[0] <= following <= SURROGATES[1]:
+        following = SURROGATES[1] + 1
+
+    upper = stem[:-1] + chr(following)
+    return and_(username >= prefix, username < upper)
@@ -1,68 +1,211 @@
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
 from http import HTTPStatus
 from typing import Annotated
-from uuid import UUID
+from uuid import UUID, uuid4
 from zoneinfo import ZoneInfo
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jwt import DecodeError, ExpiredSignatureError, decode, encode
+from jwt import DecodeError, ExpiredSignatureError, PyJWT
+from sqlalchemy import select
 
-from src.db import Session
+from src.cache import TTLCache
+from src.db import Session, current_user_id
+from src.metrics import Counter
 from src.models import User
-from src.settings import Settings
+from src.security.revocation import revocation_list
+from src.settings import Settings, get_settings, on_settings_reload
 
 oauth2_schema = OAuth2PasswordBearer(
     tokenUrl='/auth/token',
     refreshUrl='/auth/refresh_token',
 )
 
+jwt_decode_failures = Counter(
+    'jwt_decode_failures_total',
+    'Access tokens rejected while decoding, by reason.',
+    ('reason',),
+)
+
+# Authenticated users and their current token version keyed by token `sub`,
+# so the auth dependencies skip the database on the hot path. Anything that
+# changes or removes a user must call `invalidate_user`. Other processes
+# notice within USER_CACHE_TTL_SECONDS.
+user_cache: TTLCache[str, User] = TTLCache(
+    maxsize=get_settings().USER_CACHE_MAX_SIZE,
+    ttl=get_settings().USER_CACHE_TTL_SECONDS,
+)
+token_versions: TTLCache[str, int] = TTLCache(
+    maxsize=get_settings().USER_CACHE_MAX_SIZE,
+    ttl=get_settings().USER_CACHE_TTL_SECONDS,
+)
+
+
+class TokenCodec:
+    """Signs and verifies access tokens with the configured key."""
+
+    def __init__(self, settings: Settings):
+        self.key = settings.SECRET_KEY
+        self.algorithm = settings.ALGORITHM
+        self.expire_delta = timedelta(
+            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+        )
+        self._algorithms = [settings.ALGORITHM]
+        self._jwt = PyJWT()
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        return self._jwt.decode(token, self.key, algorithms=self._algorithms)
+
+
+@lru_cache
+def get_token_codec() -> TokenCodec:
+    return TokenCodec(get_settings())
+
+
+on_settings_reload(get_token_codec.cache_clear)
+
 
 def create_access_token(data: dict) -> str:
+    codec = get_token_codec()
     to_encode = data.copy()
-    expire = datetime.now(tz=ZoneInfo('UTC')) + timedelta(
-        minutes=Settings().ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-    to_encode.update({'exp': expire})
-    encoded_jwt = encode(
-        to_encode,
-        Settings().SECRET_KEY,
-        algorithm=Settings().ALGORITHM,
-    )
-    return encoded_jwt
+    expire = datetime.now(tz=ZoneInfo('UTC')) + codec.expire_delta
+    to_encode.update({'exp': expire, 'jti': uuid4().hex})
+    return codec.encode(to_encode)
 
 
-async def get_current_user(
-    session: Session,
-    token: str = Depends(oauth2_schema),
-):
-    credentials_exception = HTTPException(
+def token_claims(user: User) -> dict:
+    """Claims that let `get_current_principal` trust a token on its own."""
+    return {
+        'sub': str(user.id),
+        'username': user.username,
+        'ver': user.token_version,
+    }
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
 
-    try:
-        payload = decode(
-            token, Settings().SECRET_KEY, algorithms=[Settings().ALGORITHM]
-        )
-        subject_id = payload.get('sub')
 
-        if not subject_id:
-            raise credentials_exception
+async def _verify_claims(session: Session, token: str) -> dict:
+    try:
+        payload = get_token_codec().decode(token)
 
     except DecodeError:
-        raise credentials_exception
+        jwt_decode_failures.labels('invalid').inc()
+        raise _credentials_exception()
 
     except ExpiredSignatureError:
-        raise credentials_exception
+        jwt_decode_failures.labels('expired').inc()
+        raise _credentials_exception()
+
+    subject_id = payload.get('sub')
+
+    if not subject_id:
+        jwt_decode_failures.labels('missing_subject').inc()
+        raise _credentials_exception()
+
+    try:
+        current_user_id.set(UUID(subject_id))
+
+    except ValueError:
+        jwt_decode_failures.labels('invalid_subject').inc()
+        raise _credentials_exception()
 
-    user = await session.get(User, UUID(subject_id))
+    jti = payload.get('jti')
+
+    if jti is not None and await revocation_list.is_revoked(session, jti):
+        raise _credentials_exception()
+
+    return payload
+
+
+def _expires_at(payload: dict) -> datetime | None:
+    if 'exp' not in payload:
+        return None
+
+    return datetime.fromtimestamp(payload['exp'], UTC).replace(tzinfo=None)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    """Drop everything cached about a user after it changes or goes away."""
+    user_cache.pop(str(user_id))
+    token_versions.pop(str(user_id))
+
+
+async def get_current_user(
+    session: Session,
+    token: str = Depends(oauth2_schema),
+):
+    payload = await _verify_claims(session, token)
+    subject_id = payload['sub']
+    user = user_cache.get(subject_id)
 
     if user is None:
-        raise credentials_exception
+        user = await session.get(User, UUID(subject_id))
+
+        if user is None:
+            raise _credentials_exception()
+
+        user_cache.set(subject_id, user)
+        token_versions.set(subject_id, user.token_version)
+
+    # Tokens issued before versioning carry no `ver` and match version 0.
+    if payload.get('ver', 0) != user.token_version:
+        raise _credentials_exception()
 
     return user
 
 
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user as asserted by the token's signed claims."""
+
+    id: UUID
+    username: str | None
+    token_version: int
+    token_id: str | None = None
+    expires_at: datetime | None = None
+
+
+async def get_current_principal(
+    session: Session,
+    token: str = Depends(oauth2_schema),
+) -> Principal:
+    payload = await _verify_claims(session, token)
+    subject_id = payload['sub']
+    principal = Principal(
+        id=UUID(subject_id),
+        username=payload.get('username'),
+        token_version=payload.get('ver', 0),
+        token_id=payload.get('jti'),
+        expires_at=_expires_at(payload),
+    )
+    token_version = token_versions.get(subject_id)
+
+    if token_version is None:
+        token_version = await session.scalar(
+            select(User.token_version).where(User.id == principal.id)
+        )
+
+        if token_version is None:
+            raise _credentials_exception()
+
+        token_versions.set(subject_id, token_version)
+
+    if principal.token_version != token_version:
+        raise _credentials_exception()
+
+    return principal
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentPrincipal = Annotated[Principal, Depends(get_current_principal)]
@@ -1,7 +1,70 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from time import perf_counter
+
+from fastapi import HTTPException
 from pwdlib import PasswordHash
 
+from src.metrics import Gauge, Histogram, on_collect
+from src.settings import get_settings
+
 pwd_ctx = PasswordHash.recommended()
 
+password_hash_duration = Histogram(
+    'password_hash_duration_seconds',
+    'Time Argon2 took to hash or verify a password, on the hash pool.',
+    ('operation',),
+)
+password_hash_pending = Gauge(
+    'password_hash_pending', 'Hashes running or waiting on the hash pool.'
+)
+
+
+class HashPool:
+    """Bounded thread pool that keeps Argon2 off the event loop."""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='argon2'
+        )
+
+    async def run(self, func, *args):
+        """Run `func(*args)` on the pool, or fail fast with 503 when full."""
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server is busy, try again later',
+                headers={'Retry-After': '1'},
+            )
+
+        self.pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+hash_pool = HashPool(
+    max_workers=get_settings().HASH_MAX_WORKERS,
+    max_pending=get_settings().HASH_MAX_PENDING,
+)
+
+
+@on_collect
+def _hash_pool_usage():
+    password_hash_pending.set(hash_pool.pending)
+
+
+def _timed(func, *args):
+    # Timed on the worker thread, so time spent queued is not counted.
+    started = perf_counter()
+    return func(*args), perf_counter() - started
+
 
 def hash_password(password: str) -> str:
     """Hash a plaintext password."""
@@ -11,3 +74,19 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     """Verify a plaintext password against a hashed password."""
     return pwd_ctx.verify(password, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a plaintext password on the hash pool."""
+    hashed, elapsed = await hash_pool.run(_timed, hash_password, password)
+    password_hash_duration.labels('hash').observe(elapsed)
+    return hashed
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify a plaintext password on the hash pool."""
+    verified, elapsed = await hash_pool.run(
+        _timed, verify_password, password, hashed
+    )
+    password_hash_duration.labels('verify').observe(elapsed)
+    return verified
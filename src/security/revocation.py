@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.models import RevokedToken
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=UTC).replace(tzinfo=None)
+
+
+class BloomFilter:
+    """Set membership test without false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(self.size // 8 + 1)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8])
+        second = int.from_bytes(digest[8:]) | 1
+        return (
+            (first + i * second) % self.size for i in range(self.hash_count)
+        )
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """Revoked token ids, fronted by a bloom filter rebuilt from the table.
+
+    A token that is not in the filter is certainly not revoked, so the
+    check only reaches the database for revoked tokens and the rare false
+    positive. Revocations made by other processes show up on their next
+    `rebuild`.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._revoked_during_rebuild: set[str] | None = None
+
+    async def is_revoked(self, session: AsyncSession, jti: str) -> bool:
+        if jti not in self._filter:
+            return False
+
+        return await session.get(RevokedToken, jti) is not None
+
+    async def revoke(
+        self, session: AsyncSession, jti: str, expires_at: datetime
+    ) -> None:
+        session.add(RevokedToken(jti=jti, expires_at=expires_at))
+        await session.commit()
+        self._filter.add(jti)
+
+        if self._revoked_during_rebuild is not None:
+            self._revoked_during_rebuild.add(jti)
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """Reload the filter from the table, dropping expired entries."""
+        self._revoked_during_rebuild = set()
+
+        try:
+            await session.execute(
+                delete(RevokedToken).where(
+                    RevokedToken.expires_at <= _utcnow()
+                )
+            )
+            await session.commit()
+            jtis = (await session.scalars(select(RevokedToken.jti))).all()
+
+            bloom = BloomFilter(
+                max(self.capacity, 2 * len(jtis)), self.error_rate
+            )
+            for jti in [*jtis, *self._revoked_during_rebuild]:
+                bloom.add(jti)
+
+            self._filter = bloom
+        finally:
+            self._revoked_during_rebuild = None
+
+    async def rebuild_periodically(
+        self, session_factory: async_sessionmaker, interval: float
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval)
+
+            try:
+                async with session_factory() as session:
+                    await self.rebuild(session)
+            except Exception:
+                logger.exception('Rebuilding the revocation list failed')
+
+
+revocation_list = RevocationList(
+    capacity=get_settings().REVOCATION_BLOOM_CAPACITY,
+    error_rate=get_settings().REVOCATION_BLOOM_ERROR_RATE,
+)
@@ -1,3 +1,7 @@
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,6 +14,70 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
+    DATABASE_ECHO: bool | Literal['debug'] = Field(default=False)
+    DATABASE_POOL_SIZE: int = Field(default=5)
+    DATABASE_MAX_OVERFLOW: int = Field(default=10)
+    DATABASE_POOL_TIMEOUT: float = Field(default=30)
+    DATABASE_POOL_RECYCLE: int = Field(default=1800)
+    DATABASE_POOL_PRE_PING: bool = Field(default=True)
+    DATABASE_REPLICA_URLS: list[str] = Field(default=[])
+    DATABASE_REPLICA_RETRY_SECONDS: float = Field(default=30)
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = Field(default=5)
+    DATABASE_READ_YOUR_WRITES_MAX_USERS: int = Field(default=10_000)
+    SQL_SLOW_QUERY_SECONDS: float = Field(default=0.5)
+    SQL_N_PLUS_ONE_THRESHOLD: int = Field(default=10)
+    SQL_N_PLUS_ONE_RAISE: bool = Field(default=False)
+    SQLITE_JOURNAL_MODE: str = Field(default='WAL')
+    SQLITE_SYNCHRONOUS: str = Field(default='NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000)
+    SQLITE_MMAP_SIZE: int = Field(default=256 * 1024 * 1024)
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30)
+    REVOCATION_BLOOM_CAPACITY: int = Field(default=100_000)
+    REVOCATION_BLOOM_ERROR_RATE: float = Field(default=0.001)
+    REVOCATION_REBUILD_SECONDS: int = Field(default=300)
+    USER_CACHE_MAX_SIZE: int = Field(default=1024)
+    USER_CACHE_TTL_SECONDS: int = Field(default=60)
+    HASH_MAX_WORKERS: int = Field(default=4)
+    HASH_MAX_PENDING: int = Field(default=64)
+    TODOS_BULK_MAX_ITEMS: int = Field(default=500)
+    TODOS_EXPORT_BATCH_SIZE: int = Field(default=500)
+    TODOS_PURGE_BATCH_SIZE: int = Field(default=500)
+    TRASH_RETENTION_DAYS: int = Field(default=30)
+    TRASH_PURGE_INTERVAL_SECONDS: int = Field(default=3600)
+    TODO_CHANGES_RETENTION_DAYS: int = Field(default=30)
+    TODO_CHANGES_PURGE_INTERVAL_SECONDS: int = Field(default=3600)
+    JOBS_WORKERS: int = Field(default=2)
+    JOBS_MAX_PENDING: int = Field(default=1000)
+    JOBS_MAX_ATTEMPTS: int = Field(default=3)
+    JOBS_RETRY_DELAY_SECONDS: float = Field(default=1)
+    JOBS_SHUTDOWN_TIMEOUT_SECONDS: float = Field(default=10)
+    EVENTS_MAX_QUEUED: int = Field(default=100)
+    EVENTS_KEEPALIVE_SECONDS: float = Field(default=15)
+
+
+_reload_hooks: list[Callable[[], None]] = []
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Process-wide settings, read from the environment and `.env` once."""
+    return Settings()
+
+
+def on_settings_reload(hook: Callable[[], None]) -> Callable[[], None]:
+    """Register `hook` to run after `reload_settings`."""
+    _reload_hooks.append(hook)
+    return hook
+
+
+def reload_settings() -> Settings:
+    """Re-read the settings, e.g. after rotating SECRET_KEY."""
+    get_settings.cache_clear()
+    settings = get_settings()
+
+    for hook in _reload_hooks:
+        hook()
+
+    return settings
@@ -0,0 +1,105 @@
+from uuid import UUID
+
+from sqlalchemy import DDL, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.enums import ToDoStatus
+from src.models import ToDoStatusCount, table_register
+
+# Every write to `todos`, from any code path, adjusts the per-status
+# counters in the same transaction, so reading them never scans `todos`.
+# Registered on the metadata so both tables exist when these run.
+SQLITE_DDL = [
+    """
+    CREATE TRIGGER todo_status_counts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_ad AFTER DELETE ON todos BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+    END
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_au
+    AFTER UPDATE OF status, user_id ON todos
+    WHEN old.status IS NOT new.status OR old.user_id IS NOT new.user_id
+    BEGIN
+        UPDATE todo_status_counts SET count = count - 1
+        WHERE user_id = old.user_id AND status = old.status;
+        INSERT INTO todo_status_counts(user_id, status, count)
+        VALUES (new.user_id, new.status, 1)
+        ON CONFLICT(user_id, status) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE FUNCTION todo_status_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE todo_status_counts SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO todo_status_counts(user_id, status, count)
+            VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET count = todo_status_counts.count + 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_aid AFTER INSERT OR DELETE ON todos
+    FOR EACH ROW EXECUTE FUNCTION todo_status_counts_apply()
+    """,
+    """
+    CREATE TRIGGER todo_status_counts_au
+    AFTER UPDATE OF status, user_id ON todos FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION todo_status_counts_apply()
+    """,
+]
+
+for statement in SQLITE_DDL:
+    event.listen(
+        table_register.metadata,
+        'after_create',
+        DDL(statement).execute_if(dialect='sqlite'),
+    )
+
+for statement in POSTGRES_DDL:
+    event.listen(
+        table_register.metadata,
+        'after_create',
+        DDL(statement).execute_if(dialect='postgresql'),
+    )
+
+event.listen(
+    table_register.metadata,
+    'after_drop',
+    DDL('DROP FUNCTION IF EXISTS todo_status_counts_apply()').execute_if(
+        dialect='postgresql'
+    ),
+)
+
+
+async def status_counts(
+    session: AsyncSession, user_id: UUID
+) -> dict[ToDoStatus, int]:
+    """How many of the user's todos are in each status, zeros included."""
+    counts = dict.fromkeys(ToDoStatus, 0)
+    rows = await session.execute(
+        select(ToDoStatusCount.status, ToDoStatusCount.count).where(
+            ToDoStatusCount.user_id == user_id
+        )
+    )
+    counts.update(rows.tuples().all())
+    return counts
@@ -0,0 +1,133 @@
+from uuid import UUID
+
+from sqlalchemy import DDL, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import ToDo, ToDoChange, ToDoChangeHorizon, table_register
+
+# Every write to `todos` moves that todo to the end of its owner's change
+# sequence, so a client holding sequence number N only needs the rows
+# above N. Deleting a user cascades to their changes, so no tombstones are
+# written for todos that go with them. Tombstones are pruned once they
+# are older than TODO_CHANGES_RETENTION_DAYS (see `src.tasks`).
+_SQLITE_UPSERT = """
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            {row}.id,
+            {row}.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = {row}.user_id),
+            {deleted}
+        )
+        ON CONFLICT(todo_id) DO UPDATE SET
+            user_id = excluded.user_id,
+            seq = excluded.seq,
+            deleted = excluded.deleted,
+            changed_at = CURRENT_TIMESTAMP;
+"""
+
+SQLITE_DDL = [
+    'CREATE TRIGGER todo_changes_ai AFTER INSERT ON todos BEGIN'
+    + _SQLITE_UPSERT.format(row='new', deleted=0)
+    + 'END',
+    'CREATE TRIGGER todo_changes_au AFTER UPDATE ON todos BEGIN'
+    + _SQLITE_UPSERT.format(row='new', deleted=0)
+    + 'END',
+    'CREATE TRIGGER todo_changes_ad AFTER DELETE ON todos '
+    'WHEN EXISTS (SELECT 1 FROM users WHERE id = old.user_id) BEGIN'
+    + _SQLITE_UPSERT.format(row='old', deleted=1)
+    + 'END',
+]
+
+# Locking the owner serializes a user's writes, so their sequence numbers
+# commit in order and a reader never skips one that commits late.
+POSTGRES_DDL = [
+    """
+    CREATE FUNCTION todo_changes_record() RETURNS trigger AS $$
+    DECLARE
+        changed todos%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+
+        PERFORM 1 FROM users WHERE id = changed.user_id FOR UPDATE;
+
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+
+        INSERT INTO todo_changes(todo_id, user_id, seq, deleted)
+        VALUES (
+            changed.id,
+            changed.user_id,
+            (SELECT coalesce(max(seq), 0) + 1 FROM todo_changes
+             WHERE user_id = changed.user_id),
+            TG_OP = 'DELETE'
+        )
+        ON CONFLICT (todo_id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            seq = EXCLUDED.seq,
+            deleted = EXCLUDED.deleted,
+            changed_at = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER todo_changes_record
+    AFTER INSERT OR UPDATE OR DELETE ON todos
+    FOR EACH ROW EXECUTE FUNCTION todo_changes_record()
+    """,
+]
+
+for statement in SQLITE_DDL:
+    event.listen(
+        table_register.metadata,
+        'after_create',
+        DDL(statement).execute_if(dialect='sqlite'),
+    )
+
+for statement in POSTGRES_DDL:
+    event.listen(
+        table_register.metadata,
+        'after_create',
+        DDL(statement).execute_if(dialect='postgresql'),
+    )
+
+event.listen(
+    table_register.metadata,
+    'after_drop',
+    DDL('DROP FUNCTION IF EXISTS todo_changes_record()').execute_if(
+        dialect='postgresql'
+    ),
+)
+
+
+async def changes_since(
+    session: AsyncSession, user_id: UUID, since: int, limit: int
+) -> list[tuple[int, UUID, ToDo | None]]:
+    """The user's next `limit` changes after `since`, oldest first.
+
+    Each row is (seq, todo id, todo), with no todo for a tombstone.
+    """
+    rows = await session.execute(
+        select(ToDoChange.seq, ToDoChange.todo_id, ToDo)
+        .outerjoin(ToDo, ToDo.id == ToDoChange.todo_id)
+        .where(ToDoChange.user_id == user_id, ToDoChange.seq > since)
+        .order_by(ToDoChange.seq)
+        .limit(limit)
+    )
+    return rows.tuples().all()
+
+
+async def changes_horizon(session: AsyncSession, user_id: UUID) -> int:
+    """Newest change pruned for the user; sync tokens below it are stale."""
+    horizon = await session.scalar(
+        select(ToDoChangeHorizon.seq).where(
+            ToDoChangeHorizon.user_id == user_id
+        )
+    )
+    return horizon or 0
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+from uuid import UUID
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+
+from src.enums import ToDoStatus
+from src.metrics import Counter, Gauge
+from src.models import ToDo, ToDoChange, ToDoChangeHorizon
+from src.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+trash_purge_runs = Counter(
+    'trash_purge_runs_total', 'Runs of the expired trash purger.'
+)
+trash_purged_rows = Counter(
+    'trash_purged_rows_total', 'Trashed todos deleted for being expired.'
+)
+trash_purge_duration = Gauge(
+    'trash_purge_last_duration_seconds',
+    'How long the last expired trash purge took.',
+)
+changes_purged_rows = Counter(
+    'todo_changes_purged_rows_total',
+    'Deletion tombstones dropped from the change log for being expired.',
+)
+
+# Both take the same ON CONFLICT arguments.
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+async def _delete_todos(session: AsyncSession, *criteria) -> int:
+    """Delete matching todos a batch per transaction; return how many."""
+    batch_size = get_settings().TODOS_PURGE_BATCH_SIZE
+    batch = select(ToDo.id).where(*criteria).limit(batch_size)
+    deleted = 0
+
+    while True:
+        result = await session.execute(
+            delete(ToDo)
+            .where(ToDo.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        deleted += result.rowcount
+
+        if result.rowcount < batch_size:
+            return deleted
+
+
+async def purge_trash(session: AsyncSession, user_id: UUID) -> None:
+    await _delete_todos(
+        session, ToDo.user_id == user_id, ToDo.status == ToDoStatus.TRASH
+    )
+
+
+async def purge_expired_trash(session: AsyncSession) -> int:
+    """Delete todos left in the trash longer than TRASH_RETENTION_DAYS.
+
+    `updated_at` stands in for when a todo was trashed, since moving it to
+    the trash is its last update.
+    """
+    start = perf_counter()
+    retention = timedelta(days=get_settings().TRASH_RETENTION_DAYS)
+    # Naive UTC, like the CURRENT_TIMESTAMP defaults `updated_at` holds.
+    cutoff = datetime.now(tz=UTC).replace(tzinfo=None) - retention
+    deleted = await _delete_todos(
+        session, ToDo.status == ToDoStatus.TRASH, ToDo.updated_at < cutoff
+    )
+
+    trash_purge_runs.inc()
+    trash_purged_rows.inc(deleted)
+    trash_purge_duration.set(perf_counter() - start)
+    return deleted
+
+
+async def purge_expired_changes(session: AsyncSession) -> int:
+    """Drop deletion tombstones older than TODO_CHANGES_RETENTION_DAYS.
+
+    The newest one dropped per user becomes their horizon, so a client
+    whose sync token predates it is told to sync again from scratch.
+    """
+    batch_size = get_settings().TODOS_PURGE_BATCH_SIZE
+    retention = timedelta(days=get_settings().TODO_CHANGES_RETENTION_DAYS)
+    cutoff = datetime.now(tz=UTC).replace(tzinfo=None) - retention
+    # Each user's newest change stays, since the triggers number the next
+    # one after it.
+    other = aliased(ToDoChange)
+    newest = (
+        select(func.max(other.seq))
+        .where(other.user_id == ToDoChange.user_id)
+        .scalar_subquery()
+    )
+    batch = (
+        select(ToDoChange.todo_id, ToDoChange.user_id, ToDoChange.seq)
+        .where(
+            ToDoChange.deleted,
+            ToDoChange.changed_at < cutoff,
+            ToDoChange.seq < newest,
+        )
+        .limit(batch_size)
+    )
+    insert = _INSERTS[session.bind.dialect.name]
+    deleted = 0
+
+    while rows := (await session.execute(batch)).all():
+        horizons = {}
+
+        for _, user_id, seq in rows:
+            horizons[user_id] = max(seq, horizons.get(user_id, 0))
+
+        upsert = insert(ToDoChangeHorizon)
+        await session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[ToDoChangeHorizon.user_id],
+                set_={'seq': upsert.excluded.seq},
+                where=ToDoChangeHorizon.seq < upsert.excluded.seq,
+            ),
+            [dict(user_id=key, seq=seq) for key, seq in horizons.items()],
+        )
+        await session.execute(
+            delete(ToDoChange).where(
+                ToDoChange.todo_id.in_([todo_id for todo_id, _, _ in rows])
+            )
+        )
+        await session.commit()
+        deleted += len(rows)
+
+        if len(rows) < batch_size:
+            break
+
+    changes_purged_rows.inc(deleted)
+    return deleted
+
+
+async def purge_trash_periodically(
+    session_factory: async_sessionmaker, interval: float
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+
+        try:
+            async with session_factory() as session:
+                await purge_expired_trash(session)
+        except Exception:
+            logger.exception('Purging expired trash failed')
+
+
+async def purge_changes_periodically(
+    session_factory: async_sessionmaker, interval: float
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+
+        try:
+            async with session_factory() as session:
+                await purge_expired_changes(session)
+        except Exception:
+            logger.exception('Purging expired todo changes failed')
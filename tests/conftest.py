@@ -1,20 +1,32 @@
+import asyncio
 from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import event
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from src import db
 from src.app import app
-from src.db import get_session
+from src.db import (
+    RoutingSession,
+    build_engine,
+    get_read_session,
+    get_session,
+)
+from src.jobs import job_queue
 from src.models import table_register
+from src.settings import Settings, reload_settings
 from tests.factories import UserFactory
 
 
 @pytest.fixture(scope='session')
 async def engine():
-    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    engine = build_engine(
+        Settings(DATABASE_URL='sqlite+aiosqlite:///:memory:')
+    )
 
     async with engine.begin() as conn:
         await conn.run_sync(table_register.metadata.create_all)
@@ -24,6 +36,8 @@ async def engine():
     async with engine.begin() as conn:
         await conn.run_sync(table_register.metadata.drop_all)
 
+    await engine.dispose()
+
 
 @pytest.fixture(scope='session')
 async def session(engine):
@@ -36,8 +50,28 @@ async def session(engine):
         yield session
 
 
+@pytest.fixture(scope='session', autouse=True)
+def fail_on_n_plus_one():
+    # A request running one statement SQL_N_PLUS_ONE_THRESHOLD times fails
+    # its test instead of only logging a warning. Set in the environment,
+    # so settings reloaded by a test keep it.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('SQL_N_PLUS_ONE_RAISE', 'true')
+        reload_settings()
+        yield
+
+    reload_settings()
+
+
 @pytest.fixture(scope='session')
-async def client(session):
+async def jobs(engine):
+    job_queue.start(async_sessionmaker(engine, expire_on_commit=False))
+    yield job_queue
+    await job_queue.stop(timeout=5)
+
+
+@pytest.fixture(scope='session')
+async def client(session, jobs):
     async def get_session_override():
         return session
 
@@ -45,11 +79,85 @@ async def client(session):
         transport=ASGITransport(app), base_url='http://test'
     ) as client:
         app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
         yield client
 
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def real_sessions(engine, monkeypatch):
+    """Let requests open sessions through the real `get_session`."""
+    monkeypatch.setattr(
+        db,
+        'async_session',
+        async_sessionmaker(
+            engine, expire_on_commit=False, sync_session_class=RoutingSession
+        ),
+    )
+    monkeypatch.delitem(app.dependency_overrides, get_session)
+
+
+class ASGIStream:
+    """One streaming request or WebSocket driven against the app directly.
+
+    httpx's ASGI transport waits for the whole response, which an event
+    stream or a WebSocket never finishes.
+    """
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self._to_app = asyncio.Queue()
+        self._from_app = asyncio.Queue()
+
+    async def __aenter__(self):
+        if self.scope['type'] == 'http':
+            await self._to_app.put({'type': 'http.request', 'body': b''})
+
+        self._task = asyncio.create_task(
+            app(self.scope, self._to_app.get, self._from_app.put)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._to_app.put({
+            'type': f'{self.scope["type"]}.disconnect',
+            'code': 1000,
+        })
+        await asyncio.wait_for(self._task, timeout=5)
+
+    async def send(self, message: dict) -> None:
+        await self._to_app.put(message)
+
+    async def receive(self) -> dict:
+        return await asyncio.wait_for(self._from_app.get(), timeout=5)
+
+
+@pytest.fixture
+def asgi_stream():
+    def connect(scope_type, path, *, query_string='', headers=None):
+        return ASGIStream({
+            'type': scope_type,
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http' if scope_type == 'http' else 'ws',
+            'server': ('test', 80),
+            'client': ('test', 50000),
+            'root_path': '',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query_string.encode(),
+            'headers': [
+                (name.lower().encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+            'subprotocols': [],
+        })
+
+    return connect
+
+
 @pytest.fixture(scope='session')
 async def user(session):
     password = '12345678'
@@ -94,6 +202,29 @@ def mock_db_time():
     return _mock_db_time
 
 
+@contextmanager
+def _count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+    )
+
+    yield statements
+
+    event.remove(
+        engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+    )
+
+
+@pytest.fixture
+def count_queries(engine):
+    return partial(_count_queries, engine)
+
+
 @pytest.fixture
 async def token(client, user):
     response = await client.post(
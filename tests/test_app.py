@@ -5,3 +5,29 @@ async def test_index_root(client):
     response = await client.get('/')
     assert response.status_code == HTTPStatus.OK
     assert response.json() == dict(message='Welcome, the To Do List')
+
+
+async def test_metrics(client, user):
+    await client.post(
+        '/auth/token',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+    await client.get('/')
+
+    response = await client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['Content-Type'].startswith('text/plain')
+    assert '# TYPE http_request_duration_seconds histogram' in response.text
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/",le="+Inf"}'
+        in response.text
+    )
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in (
+        response.text
+    )
+    assert 'http_requests_in_progress 1' in response.text
+    assert 'password_hash_duration_seconds_count{operation="verify"}' in (
+        response.text
+    )
+    assert '# TYPE db_pool_checked_out_connections gauge' in response.text
@@ -3,6 +3,7 @@ from http import HTTPStatus
 from freezegun import freeze_time
 
 from src.schemas import TokenResponse
+from src.security.hash import hash_pool
 
 
 async def test_get_token(client, user):
@@ -53,6 +54,19 @@ async def test_token_wrong_password(client, user):
     assert response.json() == {'detail': 'Incorrect username or password'}
 
 
+async def test_token_hash_pool_overloaded(client, user, monkeypatch):
+    monkeypatch.setattr(hash_pool, 'max_pending', 0)
+
+    response = await client.post(
+        '/auth/token',
+        data={'username': user.username, 'password': '12345678'},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['Retry-After'] == '1'
+    assert response.json() == {'detail': 'Server is busy, try again later'}
+
+
 async def test_refresh_token(client, token):
     response = await client.post(
         '/auth/refresh_token',
@@ -97,3 +111,27 @@ async def test_get_current_user(client, user, token):
     assert data['data']['username'] == user.username
     assert data['data']['createdAt'] == user.created_at.isoformat()
     assert data['data']['updatedAt'] == user.updated_at.isoformat()
+
+
+async def test_get_current_user_not_modified(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = (await client.get('/auth/me', headers=headers)).headers['ETag']
+
+    response = await client.get(
+        '/auth/me', headers=dict(headers, **{'If-None-Match': etag})
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+async def test_logout_revokes_token(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = await client.post('/auth/logout', headers=headers)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {'message': 'Logged out'}
+
+    response = await client.get('/auth/me', headers=headers)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    response = await client.post('/auth/refresh_token', headers=headers)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
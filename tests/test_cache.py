@@ -0,0 +1,49 @@
+from freezegun import freeze_time
+
+from src.cache import TTLCache
+
+
+def test_ttl_cache_returns_stored_value():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('missing') is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    maxsize = 2
+    cache = TTLCache(maxsize=maxsize, ttl=60)
+    cache.set('a', 'first')
+    cache.set('b', 'second')
+    cache.get('a')
+    cache.set('c', 'third')
+
+    assert cache.get('a') == 'first'
+    assert cache.get('b') is None
+    assert cache.get('c') == 'third'
+    assert len(cache) == maxsize
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    with freeze_time('2024-01-01 12:00:00') as frozen:
+        cache.set('a', 1)
+        frozen.tick(59)
+        assert cache.get('a') == 1
+        frozen.tick(1)
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+
+def test_ttl_cache_pop_and_clear():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    cache.pop('a')
+    cache.pop('missing')
+    assert cache.get('a') is None
+
+    cache.clear()
+    assert len(cache) == 0
@@ -1,9 +1,239 @@
-from sqlalchemy.ext.asyncio import AsyncSession
+import os
+from datetime import datetime
+from uuid import UUID, uuid7
 
-from src.db import get_session
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from src.db import (
+    ReplicaPool,
+    RoutingSession,
+    bind_replica,
+    build_engine,
+    current_user_id,
+    get_session,
+    recent_writers,
+)
+from src.models import User, table_register
+from src.search import username_prefix
+from src.settings import Settings
+
+INDEXED_TODO_QUERIES = [
+    (
+        'SELECT * FROM todos WHERE user_id = :user_id ORDER BY id',
+        'ix_todos_user_id_id',
+    ),
+    (
+        'SELECT * FROM todos WHERE user_id = :user_id AND status = :status '
+        'ORDER BY id',
+        'ix_todos_user_id_status_id',
+    ),
+    (
+        'SELECT * FROM todos WHERE user_id = :user_id AND done_at >= :since',
+        'ix_todos_user_id_done_at',
+    ),
+    (
+        'SELECT * FROM todos WHERE status = :status AND updated_at < :since',
+        'ix_todos_status_updated_at',
+    ),
+]
+QUERY_PARAMS = dict(user_id='0' * 32, status='todo', since='2024-01-01')
+POSTGRES_QUERY_PARAMS = dict(
+    user_id=UUID(int=0), status='todo', since=datetime(2024, 1, 1)
+)
+
+
+@pytest.fixture
+async def primary_and_replica(tmp_path):
+    engines = [
+        build_engine(
+            Settings(DATABASE_URL=f'sqlite+aiosqlite:///{tmp_path / name}')
+        )
+        for name in ('primary.sqlite3', 'replica.sqlite3')
+    ]
+
+    for engine in engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(table_register.metadata.create_all)
+
+    yield engines
+
+    for engine in engines:
+        await engine.dispose()
+
+
+def routing_sessions(primary):
+    return async_sessionmaker(
+        primary, expire_on_commit=False, sync_session_class=RoutingSession
+    )
 
 
 async def test_get_session():
     session = await anext(get_session())
     assert session is not None
     assert isinstance(session, AsyncSession)
+
+
+async def test_build_engine_tunes_sqlite_file(tmp_path):
+    pool_size = 3
+    busy_timeout = 1234
+    settings = Settings(
+        DATABASE_URL=f'sqlite+aiosqlite:///{tmp_path / "tuned.sqlite3"}',
+        DATABASE_POOL_SIZE=pool_size,
+        SQLITE_BUSY_TIMEOUT_MS=busy_timeout,
+    )
+    engine = build_engine(settings)
+
+    async with engine.connect() as conn:
+        journal_mode = await conn.scalar(text('PRAGMA journal_mode'))
+        synchronous = await conn.scalar(text('PRAGMA synchronous'))
+        timeout = await conn.scalar(text('PRAGMA busy_timeout'))
+        mmap_size = await conn.scalar(text('PRAGMA mmap_size'))
+        foreign_keys = await conn.scalar(text('PRAGMA foreign_keys'))
+
+    await engine.dispose()
+
+    assert engine.echo is False
+    assert engine.pool.size() == pool_size
+    assert journal_mode == 'wal'
+    assert synchronous == 1  # NORMAL
+    assert timeout == busy_timeout
+    assert mmap_size == settings.SQLITE_MMAP_SIZE
+    assert foreign_keys == 1
+
+
+async def test_build_engine_in_memory_sqlite():
+    engine = build_engine(
+        Settings(DATABASE_URL='sqlite+aiosqlite:///:memory:')
+    )
+
+    async with engine.connect() as conn:
+        assert await conn.scalar(text('SELECT 1')) == 1
+
+    await engine.dispose()
+
+
+async def test_routing_session_reads_replica_until_it_writes(
+    primary_and_replica,
+):
+    primary, replica = primary_and_replica
+
+    async with AsyncSession(replica) as session:
+        session.add(User(username='replica-only', password='secret'))
+        await session.commit()
+
+    usernames = select(User.username)
+    writer = current_user_id.set(uuid7())
+
+    try:
+        async with routing_sessions(primary)() as session:
+            assert await bind_replica(session, ReplicaPool([replica], 30))
+            assert (await session.scalars(usernames)).all() == ['replica-only']
+
+            session.add(User(username='primary', password='secret'))
+            await session.commit()
+
+            assert (await session.scalars(usernames)).all() == ['primary']
+
+        assert recent_writers.get(current_user_id.get())
+
+        # The writer's next requests read from the primary for a while.
+        async with routing_sessions(primary)() as session:
+            assert await bind_replica(session, ReplicaPool([replica], 30))
+            assert (await session.scalars(usernames)).all() == ['primary']
+    finally:
+        current_user_id.reset(writer)
+
+    async with routing_sessions(primary)() as session:
+        assert await bind_replica(session, ReplicaPool([replica], 30))
+        assert (await session.scalars(usernames)).all() == ['replica-only']
+
+
+async def test_replica_pool_round_robin():
+    first, second = (
+        build_engine(Settings(DATABASE_URL='sqlite+aiosqlite:///:memory:'))
+        for _ in range(2)
+    )
+    replicas = ReplicaPool([first, second], retry_after=30)
+
+    assert replicas.healthy() == [first, second]
+    assert replicas.healthy() == [second, first]
+    assert replicas.healthy() == [first, second]
+
+
+async def test_bind_replica_fails_over(primary_and_replica, tmp_path):
+    primary, replica = primary_and_replica
+    unreachable = build_engine(
+        Settings(
+            DATABASE_URL=(
+                f'sqlite+aiosqlite:///{tmp_path / "missing" / "db.sqlite3"}'
+            )
+        )
+    )
+    replicas = ReplicaPool([unreachable, replica], retry_after=30)
+
+    async with routing_sessions(primary)() as session:
+        assert await bind_replica(session, replicas)
+        assert session.info['replica'] is replica.sync_engine
+
+    assert replicas.healthy() == [replica]
+    assert replicas.healthy() == [replica]
+
+    async with routing_sessions(primary)() as session:
+        assert not await bind_replica(session, ReplicaPool([unreachable], 30))
+        assert 'replica' not in session.info
+
+
+@pytest.mark.parametrize(('query', 'index'), INDEXED_TODO_QUERIES)
+async def test_todos_queries_use_index_on_sqlite(engine, query, index):
+    async with engine.connect() as conn:
+        plan = await conn.execute(
+            text(f'EXPLAIN QUERY PLAN {query}'), QUERY_PARAMS
+        )
+        details = ' '.join(row.detail for row in plan)
+
+    assert f'USING INDEX {index}' in details
+    assert 'USE TEMP B-TREE' not in details
+
+
+async def test_username_prefix_uses_index_on_sqlite(engine):
+    query = select(User).where(username_prefix('ab', 'sqlite'))
+
+    async with engine.connect() as conn:
+        compiled = query.compile(
+            conn.sync_connection, compile_kwargs={'literal_binds': True}
+        )
+        plan = await conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))
+        details = ' '.join(row.detail for row in plan)
+
+    assert 'USING INDEX' in details
+    assert 'username>? AND username<?' in details
+
+
+@pytest.mark.skipif(
+    'TEST_POSTGRES_URL' not in os.environ,
+    reason='TEST_POSTGRES_URL is not set',
+)
+@pytest.mark.parametrize(('query', 'index'), INDEXED_TODO_QUERIES)
+async def test_todos_queries_use_index_on_postgres(query, index):
+    engine = create_async_engine(os.environ['TEST_POSTGRES_URL'])
+
+    async with engine.begin() as conn:
+        await conn.run_sync(table_register.metadata.create_all)
+        # Empty tables are always cheaper to scan sequentially, so only
+        # assert that the planner *can* answer the query from the index.
+        await conn.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = await conn.execute(
+            text(f'EXPLAIN {query}'), POSTGRES_QUERY_PARAMS
+        )
+        details = ' '.join(row[0] for row in plan)
+        await conn.run_sync(table_register.metadata.drop_all)
+
+    await engine.dispose()
+
+    assert index in details
@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+
+import pytest
+
+from src.events import Event, EventBroker
+
+
+async def test_events_reach_only_their_owner():
+    broker = EventBroker(max_queued=10)
+    owner, other = uuid.uuid4(), uuid.uuid4()
+
+    with (
+        broker.subscribe(owner) as first,
+        broker.subscribe(owner) as second,
+        broker.subscribe(other) as bystander,
+    ):
+        broker.publish(owner, Event('created', '{}'))
+
+        assert await first.get(timeout=1) == Event('created', '{}')
+        assert await second.get(timeout=1) == Event('created', '{}')
+        with pytest.raises(TimeoutError):
+            await bystander.get(timeout=0.01)
+
+    assert not broker.has_subscribers(owner)
+    assert not broker.has_subscribers(other)
+
+
+async def test_slow_subscriber_is_dropped():
+    broker = EventBroker(max_queued=2)
+    user_id = uuid.uuid4()
+
+    with broker.subscribe(user_id) as subscription:
+        for number in range(3):
+            broker.publish(user_id, Event('updated', str(number)))
+
+        # What was queued before falling behind is still delivered.
+        assert (await subscription.get(timeout=1)).data == '0'
+        assert (await subscription.get(timeout=1)).data == '1'
+        with pytest.raises(asyncio.QueueShutDown):
+            await subscription.get(timeout=1)
+
+
+def test_event_encodings():
+    event = Event('deleted', '{"id":"1"}')
+
+    assert event.sse() == 'event: deleted\ndata: {"id":"1"}\n\n'
+    assert event.json() == '{"type":"deleted","data":{"id":"1"}}'
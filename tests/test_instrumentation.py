@@ -0,0 +1,126 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.instrumentation import (
+    NPlusOneError,
+    db_queries,
+    db_slow_queries,
+    track_queries,
+)
+from src.models import ToDo, User
+from src.settings import get_settings, reload_settings
+from tests.factories import ToDoFactory, UserFactory
+
+
+async def test_server_timing_header(client, token):
+    queries_before = db_queries.labels('/todos/').value
+
+    response = await client.get(
+        '/todos/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    server_timing = response.headers['Server-Timing']
+    assert server_timing.startswith('db;dur=')
+    assert server_timing.endswith(' queries"')
+    assert db_queries.labels('/todos/').value > queries_before
+
+
+async def test_slow_queries_are_logged_redacted(
+    session, user, monkeypatch, caplog
+):
+    monkeypatch.setattr(get_settings(), 'SQL_SLOW_QUERY_SECONDS', 0)
+    slow_before = db_slow_queries.value
+
+    with caplog.at_level(logging.WARNING, logger='src.instrumentation'):
+        await session.scalar(
+            select(User).where(User.username == user.username)
+        )
+
+    assert db_slow_queries.value == slow_before + 1
+    assert 'Slow query on - took' in caplog.text
+    assert 'FROM users' in caplog.text
+    assert user.username not in caplog.text
+
+
+async def test_slow_queries_are_logged_with_the_route(
+    client, user, token, monkeypatch, caplog
+):
+    monkeypatch.setattr(get_settings(), 'SQL_SLOW_QUERY_SECONDS', 0)
+
+    with caplog.at_level(logging.WARNING, logger='src.instrumentation'):
+        await client.get(
+            f'/users/{user.id}',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    assert 'Slow query on /users/{user_id} took' in caplog.text
+    assert str(user.id) not in caplog.text
+
+
+async def test_failed_statements_are_not_timed(session, user):
+    user_id, username = user.id, user.username
+    pause = 0.1
+
+    with track_queries() as stats:
+        session.add(User(username=username, password='secret'))
+
+        with pytest.raises(IntegrityError):
+            await session.flush()
+
+        await session.rollback()
+        # Counted below if the failed statement's start time were reused.
+        await asyncio.sleep(pause)
+        await session.scalar(select(User.id).where(User.id == user_id))
+
+    # The rollback expired it, and later tests read it outside a greenlet.
+    await session.refresh(user)
+
+    assert stats.count == 1
+    assert stats.duration < pause
+    assert stats.server_timing().endswith('desc="1 queries"')
+
+
+async def test_repeated_statement_is_an_n_plus_one(session, user, caplog):
+    threshold = get_settings().SQL_N_PLUS_ONE_THRESHOLD
+    query = select(User).where(User.id == user.id)
+
+    with track_queries('/users/') as stats:
+        for _ in range(threshold - 1):
+            await session.scalar(query)
+
+        with pytest.raises(NPlusOneError):
+            await session.scalar(query)
+
+    assert stats.count == threshold - 1
+    assert 'Possible N+1 on /users/' in caplog.text
+
+
+async def test_lazy_loads_raise_after_settings_reload(engine):
+    reload_settings()
+    threshold = get_settings().SQL_N_PLUS_ONE_THRESHOLD
+    users = UserFactory.create_batch(threshold)
+    user_ids = [user.id for user in users]
+
+    async with AsyncSession(engine) as session:
+        session.add_all(users)
+        session.add_all(ToDoFactory(user_id=user_id) for user_id in user_ids)
+        await session.commit()
+
+    def load_owners(sync_session):
+        for todo in sync_session.scalars(
+            select(ToDo).where(ToDo.user_id.in_(user_ids))
+        ):
+            todo.user  # noqa: B018
+
+    async with AsyncSession(engine) as session:
+        try:
+            with track_queries('/todos/'), pytest.raises(NPlusOneError):
+                await session.run_sync(load_owners)
+        finally:
+            await session.execute(delete(User).where(User.id.in_(user_ids)))
+            await session.commit()
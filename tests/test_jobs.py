@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.jobs import JobQueue
+
+
+@pytest.fixture
+async def queue(engine):
+    queue = JobQueue(workers=2, max_pending=10, max_attempts=3, retry_delay=0)
+    queue.start(async_sessionmaker(engine))
+    yield queue
+    await queue.stop(timeout=1)
+
+
+async def test_job_runs_with_a_session(queue):
+    results = []
+
+    async def job(session, value):
+        results.append((await session.scalar(text('SELECT 1')), value))
+
+    queue.enqueue(job, 'done')
+    await queue.join()
+
+    assert results == [(1, 'done')]
+
+
+async def test_job_is_retried_until_it_succeeds(queue):
+    attempts = []
+
+    async def flaky(session):
+        attempts.append(1)
+        if len(attempts) < queue.max_attempts:
+            raise RuntimeError('try again')
+
+    queue.enqueue(flaky)
+    await queue.join()
+
+    assert len(attempts) == queue.max_attempts
+
+
+async def test_job_gives_up_after_max_attempts(queue, caplog):
+    attempts = []
+
+    async def broken(session):
+        attempts.append(1)
+        raise RuntimeError('always fails')
+
+    queue.enqueue(broken)
+    await queue.join()
+
+    assert len(attempts) == queue.max_attempts
+    assert 'Job broken failed after 3 attempts' in caplog.text
+
+
+async def test_enqueue_rejects_when_full(engine):
+    queue = JobQueue(workers=1, max_pending=1, max_attempts=1, retry_delay=0)
+
+    async def job(session):
+        pass
+
+    queue.enqueue(job)
+
+    with pytest.raises(HTTPException) as exc_info:
+        queue.enqueue(job)
+
+    assert exc_info.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+    queue.start(async_sessionmaker(engine))
+    await queue.join()
+    await queue.stop(timeout=1)
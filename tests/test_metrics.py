@@ -0,0 +1,54 @@
+import pytest
+
+from src.metrics import Counter, Histogram, registry
+
+
+def test_histogram_samples_are_cumulative():
+    histogram = Histogram('test_seconds', 'Test.', ('route',))
+    registry.remove(histogram)
+    child = histogram.labels('/')
+    observations = [0.001, 0.005, 0.3, 60]
+
+    for value in observations:
+        child.observe(value)
+
+    samples = list(child.samples((('route', '/'),)))
+    buckets = [(labels[-1][1], value) for name, labels, value in samples[:-2]]
+
+    assert buckets == [
+        ('0.005', 2),
+        ('0.01', 2),
+        ('0.025', 2),
+        ('0.05', 2),
+        ('0.1', 2),
+        ('0.25', 2),
+        ('0.5', 3),
+        ('1', 3),
+        ('2.5', 3),
+        ('5', 3),
+        ('10', 3),
+        ('+Inf', 4),
+    ]
+    assert samples[-2] == (
+        'test_seconds_sum',
+        (('route', '/'),),
+        pytest.approx(sum(observations)),
+    )
+    assert samples[-1] == ('test_seconds_count', (('route', '/'),), 4)
+    assert histogram.labels('/') is child
+    assert not any(histogram.labels('/other').counts)
+
+
+def test_labelled_children_are_independent():
+    counter = Counter('test_total', 'Test.', ('reason',))
+    registry.remove(counter)
+
+    counter.labels('a').inc()
+    counter.labels('a').inc()
+    counter.labels('b').inc()
+
+    values = {
+        labels: child.value for labels, child in counter.children.items()
+    }
+    assert values == {('a',): 2, ('b',): 1}
+    assert counter.value == 0
@@ -0,0 +1,102 @@
+from http import HTTPStatus
+
+from tests.factories import ToDoFactory
+
+
+async def _request(client, count_queries, method, url, **kwargs):
+    with count_queries() as statements:
+        response = await client.request(method, url, **kwargs)
+    return response, statements
+
+
+async def test_user_reads_do_not_load_todos(
+    session, client, user, count_queries
+):
+    session.add_all(ToDoFactory.create_batch(3, user_id=user.id))
+    await session.commit()
+
+    for url in ('/users/', f'/users/{user.id}'):
+        response, statements = await _request(
+            client, count_queries, 'GET', url
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert len(statements) == 1
+        assert 'todos' not in statements[0]
+
+
+async def test_login_issues_one_query(client, user, count_queries):
+    response, statements = await _request(
+        client,
+        count_queries,
+        'POST',
+        '/auth/token',
+        data={'username': user.username, 'password': user.clean_password},
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert len(statements) == 1
+
+
+async def test_authenticated_endpoints_query_count(
+    session, client, user, token, count_queries
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    todo = ToDoFactory(user_id=user.id)
+    session.add(todo)
+    await session.commit()
+    await client.get('/auth/me', headers=headers)
+
+    # GET /todos/ runs the ETag aggregate before the page itself.
+    expected = [
+        ('GET', '/auth/me', None, 0),
+        ('GET', '/todos/', None, 2),
+        ('POST', '/todos/', dict(title='Count me'), 1),
+        ('PATCH', f'/todos/{todo.id}', dict(status='done'), 1),
+        ('DELETE', f'/todos/{todo.id}', None, 2),
+    ]
+    for method, url, json, count in expected:
+        response, statements = await _request(
+            client, count_queries, method, url, json=json, headers=headers
+        )
+        assert response.status_code == HTTPStatus.OK, url
+        assert len(statements) == count, (method, url, statements)
+
+
+async def test_user_lifecycle_query_count(client, count_queries):
+    credentials = dict(username='query_counter', password='12345678')
+    # exists check + INSERT, then SELECT + UPDATE; both RETURNING the
+    # server-side timestamps instead of refreshing afterwards.
+    create_statements = update_statements = 2
+    # A single DELETE; the database cascades to the user's rows.
+    delete_statements = 1
+
+    response, statements = await _request(
+        client, count_queries, 'POST', '/users/', json=credentials
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    assert len(statements) == create_statements
+    user_id = response.json()['data']['id']
+
+    response = await client.post('/auth/token', data=credentials)
+    headers = {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+    response, statements = await _request(
+        client,
+        count_queries,
+        'PUT',
+        f'/users/{user_id}',
+        json=dict(password='87654321'),
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert len(statements) == update_statements
+
+    response = await client.post(
+        '/auth/token', data=dict(credentials, password='87654321')
+    )
+    headers = {'Authorization': f'Bearer {response.json()["access_token"]}'}
+
+    response, statements = await _request(
+        client, count_queries, 'DELETE', f'/users/{user_id}', headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert len(statements) == delete_statements
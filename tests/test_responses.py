@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+from time import perf_counter
+from uuid import uuid7
+
+import pytest
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from src.enums import ToDoStatus
+from src.models import ToDo
+from src.responses import ModelResponse
+from src.schemas import ToDoList
+
+
+def _todos(count):
+    user_id = uuid7()
+    todos = []
+    for index in range(count):
+        todo = ToDo(
+            title=f'Todo {index}',
+            description='Serialized many times over',
+            status=ToDoStatus.TODO,
+            user_id=user_id,
+        )
+        todo.created_at = todo.updated_at = datetime(2024, 1, 1)
+        todo.done_at = None
+        todos.append(todo)
+    return todos
+
+
+def _response_model_body(schema, content):
+    # What FastAPI does with a dict returned under `response_model`.
+    validated = schema.model_validate(content)
+    return JSONResponse(validated.model_dump(mode='json', by_alias=True)).body
+
+
+def test_model_response_renders_camel_case_json():
+    todos = _todos(2)
+    response = ModelResponse(ToDoList, dict(data=todos), headers={'X': '1'})
+
+    assert response.media_type == 'application/json'
+    assert response.headers['X'] == '1'
+    assert json.loads(response.body) == json.loads(
+        _response_model_body(ToDoList, dict(data=todos))
+    )
+    assert 'userId' in json.loads(response.body)['data'][0]
+
+
+def test_model_response_encodes_with_dump_json(monkeypatch):
+    dump_json = TypeAdapter.dump_json
+    calls = []
+
+    def spy(self, *args, **kwargs):
+        calls.append(kwargs)
+        return dump_json(self, *args, **kwargs)
+
+    def dumps(*args, **kwargs):
+        raise AssertionError('Encoded through the json module')
+
+    monkeypatch.setattr(TypeAdapter, 'dump_json', spy)
+    monkeypatch.setattr(json, 'dumps', dumps)
+    response = ModelResponse(ToDoList, dict(data=_todos(2)))
+
+    assert calls == [{'by_alias': True}]
+    assert response.body.startswith(b'{"data":[')
+
+
+@pytest.mark.benchmark
+def test_model_response_is_faster_on_10k_todos():
+    content = dict(data=_todos(10_000))
+    rounds = 3
+
+    response_model_times = []
+    model_response_times = []
+    for _ in range(rounds):
+        start = perf_counter()
+        _response_model_body(ToDoList, content)
+        response_model_times.append(perf_counter() - start)
+
+        start = perf_counter()
+        ModelResponse(ToDoList, content)
+        model_response_times.append(perf_counter() - start)
+
+    assert min(model_response_times) < min(response_model_times)
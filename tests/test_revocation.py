@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from src.models import RevokedToken
+from src.security.revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [uuid4().hex for _ in range(1000)]
+
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for _ in range(1000):
+        bloom.add(uuid4().hex)
+
+    probes = 10_000
+    false_positives = sum(uuid4().hex in bloom for _ in range(probes))
+
+    assert false_positives / probes < 0.02  # noqa: PLR2004
+
+
+async def test_revocation_list_skips_database_for_unknown_tokens(
+    session, count_queries
+):
+    revocations = RevocationList(capacity=100, error_rate=0.001)
+
+    with count_queries() as statements:
+        assert await revocations.is_revoked(session, uuid4().hex) is False
+
+    assert statements == []
+
+
+async def test_revocation_list_revoke(session):
+    revocations = RevocationList(capacity=100, error_rate=0.001)
+    jti = uuid4().hex
+
+    await revocations.revoke(
+        session, jti, datetime.now() + timedelta(minutes=5)
+    )
+
+    assert await revocations.is_revoked(session, jti) is True
+
+
+async def test_revocation_list_rebuild_from_table(session):
+    revocations = RevocationList(capacity=100, error_rate=0.001)
+    active = RevokedToken(
+        jti=uuid4().hex, expires_at=datetime.now() + timedelta(hours=1)
+    )
+    expired = RevokedToken(jti=uuid4().hex, expires_at=datetime(2000, 1, 1))
+    session.add_all([active, expired])
+    await session.commit()
+
+    await revocations.rebuild(session)
+
+    assert await revocations.is_revoked(session, active.jti) is True
+    assert await session.get(RevokedToken, expired.jti) is None
+
+
+async def test_revocation_list_rebuild_survives_errors(session, caplog):
+    revocations = RevocationList(capacity=100, error_rate=0.001)
+    rebuilt = asyncio.Event()
+    attempts = 0
+
+    @asynccontextmanager
+    async def session_factory():
+        nonlocal attempts
+        attempts += 1
+
+        if attempts == 1:
+            raise ConnectionError('database went away')
+
+        yield session
+        rebuilt.set()
+
+    task = asyncio.create_task(
+        revocations.rebuild_periodically(session_factory, interval=0)
+    )
+    await asyncio.wait_for(rebuilt.wait(), timeout=5)
+    task.cancel()
+
+    with suppress(asyncio.CancelledError):
+        await task
+
+    assert 'Rebuilding the revocation list failed' in caplog.text
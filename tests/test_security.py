@@ -1,14 +1,37 @@
+import asyncio
+import threading
 from http import HTTPStatus
+from statistics import quantiles
+from time import perf_counter
 from uuid import uuid7
 
 import pytest
 from fastapi import HTTPException
 from freezegun import freeze_time
+from jwt import decode
 from pwdlib import PasswordHash
 from pwdlib.exceptions import UnknownHashError
-
-from src.security.auth import create_access_token, get_current_user
-from src.security.hash import hash_password, verify_password
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.security.auth import (
+    create_access_token,
+    get_current_principal,
+    get_current_user,
+    get_token_codec,
+    jwt_decode_failures,
+    token_claims,
+    token_versions,
+    user_cache,
+)
+from src.security.hash import (
+    hash_password,
+    hash_password_async,
+    hash_pool,
+    pwd_ctx,
+    verify_password,
+    verify_password_async,
+)
+from src.settings import Settings, get_settings, reload_settings
 
 pwd_context = PasswordHash.recommended()
 
@@ -49,6 +72,65 @@ def test_verify_invalid_hash_format():
         verify_password('abc', 'hash_invalido')
 
 
+async def test_hash_and_verify_async():
+    password = 'senha123'
+    hashed = await hash_password_async(password)
+    assert await verify_password_async(password, hashed) is True
+    assert await verify_password_async('outra_senha', hashed) is False
+
+
+async def test_hash_pool_rejects_when_full(monkeypatch):
+    monkeypatch.setattr(hash_pool, 'max_pending', 0)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await hash_password_async('senha123')
+
+    assert excinfo.value.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert excinfo.value.headers == {'Retry-After': '1'}
+
+
+async def test_password_hashing_runs_off_the_event_loop(monkeypatch):
+    hashed = hash_password('senha123')
+    threads = []
+
+    def verify(password, hashed):
+        threads.append(threading.current_thread())
+        return pwd_context.verify(password, hashed)
+
+    monkeypatch.setattr(pwd_ctx, 'verify', verify)
+
+    assert await verify_password_async('senha123', hashed) is True
+    assert threads[0] is not threading.main_thread()
+    assert threads[0].name.startswith('argon2')
+
+
+@pytest.mark.benchmark
+async def test_login_storm_does_not_stall_other_requests(client):
+    password = 'senha123'
+    hashed = hash_password(password)
+    start = perf_counter()
+    verify_password(password, hashed)
+    single_hash = perf_counter() - start
+
+    latencies = []
+
+    async def probe():
+        for _ in range(50):
+            start = perf_counter()
+            await client.get('/')
+            latencies.append(perf_counter() - start)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(
+        probe(),
+        *(verify_password_async(password, hashed) for _ in range(16)),
+    )
+
+    # Hashing inline would park every probe behind at least one full hash.
+    p99 = quantiles(latencies, n=100)[98]
+    assert p99 < single_hash
+
+
 async def test_get_current_user_valid_token(session, user):
     valid_token = create_access_token({'sub': str(user.id)})
 
@@ -58,6 +140,82 @@ async def test_get_current_user_valid_token(session, user):
     assert current_user.username == user.username
 
 
+async def test_get_current_user_cached_skips_database(
+    engine, user, count_queries
+):
+    valid_token = create_access_token({'sub': str(user.id)})
+    user_cache.pop(str(user.id))
+
+    async with AsyncSession(engine) as session:
+        with count_queries() as statements:
+            await get_current_user(session=session, token=valid_token)
+    assert statements
+
+    async with AsyncSession(engine) as session:
+        with count_queries() as statements:
+            current_user = await get_current_user(
+                session=session, token=valid_token
+            )
+    assert statements == []
+    assert current_user.id == user.id
+
+
+async def test_get_current_principal_trusts_claims(
+    session, user, count_queries
+):
+    token = create_access_token(token_claims(user))
+    token_versions.set(str(user.id), user.token_version)
+
+    with count_queries() as statements:
+        principal = await get_current_principal(session=session, token=token)
+
+    assert statements == []
+    assert principal.id == user.id
+    assert principal.username == user.username
+    assert principal.token_version == user.token_version
+
+
+async def test_get_current_principal_loads_unknown_version(session, user):
+    token = create_access_token(token_claims(user))
+    token_versions.pop(str(user.id))
+
+    principal = await get_current_principal(session=session, token=token)
+
+    assert principal.id == user.id
+    assert token_versions.get(str(user.id)) == user.token_version
+
+
+async def test_get_current_principal_stale_token_version(session, user):
+    token = create_access_token(
+        dict(token_claims(user), ver=user.token_version - 1)
+    )
+
+    with pytest.raises(HTTPException) as excinfo:
+        await get_current_principal(session=session, token=token)
+
+    assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
+
+
+async def test_get_current_principal_user_not_found(session):
+    token = create_access_token({'sub': str(uuid7()), 'ver': 0})
+
+    with pytest.raises(HTTPException) as excinfo:
+        await get_current_principal(session=session, token=token)
+
+    assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
+
+
+async def test_get_current_user_invalid_subject(session):
+    token = create_access_token({'sub': 'not-a-uuid'})
+    failures = jwt_decode_failures.labels('invalid_subject').value
+
+    with pytest.raises(HTTPException) as excinfo:
+        await get_current_user(session=session, token=token)
+
+    assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
+    assert jwt_decode_failures.labels('invalid_subject').value == failures + 1
+
+
 async def test_get_current_user_id_not_found(session):
     invalid_token = create_access_token({'sub': str(uuid7())})
     with pytest.raises(HTTPException) as excinfo:
@@ -97,3 +255,56 @@ async def test_get_current_user_invalid_token(session):
 
     assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
     assert 'Could not validate credentials' in excinfo.value.detail
+
+
+async def test_reload_settings_rotates_signing_key(session, user, monkeypatch):
+    old_token = create_access_token({'sub': str(user.id)})
+
+    monkeypatch.setenv('SECRET_KEY', 'rotated-secret-key')
+    reload_settings()
+
+    try:
+        assert get_settings().SECRET_KEY == 'rotated-secret-key'
+        assert get_token_codec().key == 'rotated-secret-key'
+
+        with pytest.raises(HTTPException) as excinfo:
+            await get_current_user(session=session, token=old_token)
+        assert excinfo.value.status_code == HTTPStatus.UNAUTHORIZED
+
+        new_token = create_access_token({'sub': str(user.id)})
+        current_user = await get_current_user(session=session, token=new_token)
+        assert current_user.id == user.id
+    finally:
+        monkeypatch.undo()
+        reload_settings()
+
+
+def test_token_codec_does_not_reread_settings(monkeypatch):
+    subject = str(uuid7())
+    get_token_codec()
+
+    def reread_settings():
+        raise AssertionError('Settings were read again')
+
+    monkeypatch.setattr('src.settings.Settings', reread_settings)
+    token = create_access_token({'sub': subject})
+
+    assert get_token_codec().decode(token)['sub'] == subject
+
+
+@pytest.mark.benchmark
+def test_token_codec_is_cheaper_than_rereading_settings():
+    token = create_access_token({'sub': str(uuid7())})
+    rounds = 200
+
+    start = perf_counter()
+    for _ in range(rounds):
+        decode(token, Settings().SECRET_KEY, algorithms=[Settings().ALGORITHM])
+    per_settings_decode = (perf_counter() - start) / rounds
+
+    start = perf_counter()
+    for _ in range(rounds):
+        get_token_codec().decode(token)
+    per_codec_decode = (perf_counter() - start) / rounds
+
+    assert per_codec_decode * 2 < per_settings_decode
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from src.enums import ToDoStatus
+from src.models import ToDo, ToDoChange, ToDoChangeHorizon
+from src.settings import get_settings
+from src.tasks import (
+    changes_purged_rows,
+    purge_expired_changes,
+    purge_expired_trash,
+    trash_purge_runs,
+    trash_purged_rows,
+)
+from tests.factories import ToDoFactory
+
+
+async def test_purge_expired_trash_in_batches(
+    session, user, mock_db_time, count_queries, monkeypatch
+):
+    with mock_db_time(model=ToDo):
+        expired = ToDoFactory.create_batch(
+            3, user_id=user.id, status=ToDoStatus.TRASH
+        )
+        old_active = ToDoFactory(user_id=user.id, status=ToDoStatus.TODO)
+        session.add_all([*expired, old_active])
+        await session.commit()
+
+    recent = ToDoFactory(user_id=user.id, status=ToDoStatus.TRASH)
+    session.add(recent)
+    await session.commit()
+
+    batch_size = 2
+    monkeypatch.setattr(get_settings(), 'TODOS_PURGE_BATCH_SIZE', batch_size)
+    runs_before = trash_purge_runs.value
+    purged_before = trash_purged_rows.value
+
+    with count_queries() as statements:
+        deleted = await purge_expired_trash(session)
+
+    ids = [todo.id for todo in [*expired, old_active, recent]]
+    remaining = await session.scalars(select(ToDo.id).where(ToDo.id.in_(ids)))
+    assert set(remaining.all()) == {old_active.id, recent.id}
+    assert deleted >= len(expired)
+    assert trash_purge_runs.value == runs_before + 1
+    assert trash_purged_rows.value == purged_before + deleted
+
+    deletes = [s for s in statements if s.startswith('DELETE')]
+    assert len(deletes) == deleted // batch_size + 1
+
+
+async def test_purge_expired_changes_keeps_a_horizon(session, another_user):
+    todos = ToDoFactory.create_batch(4, user_id=another_user.id)
+    session.add_all(todos)
+    await session.commit()
+
+    for todo in todos[:3]:
+        await session.delete(todo)
+    await session.commit()
+
+    tombstones = select(ToDoChange).where(
+        ToDoChange.todo_id.in_([todo.id for todo in todos[:3]])
+    )
+    changes = (await session.scalars(tombstones)).all()
+    old, recent = changes[:2], changes[2]
+    await session.execute(
+        update(ToDoChange)
+        .where(ToDoChange.todo_id.in_([change.todo_id for change in old]))
+        .values(changed_at=datetime(2000, 1, 1))
+    )
+    await session.commit()
+    purged_before = changes_purged_rows.value
+
+    deleted = await purge_expired_changes(session)
+
+    remaining = await session.scalars(
+        select(ToDoChange.todo_id).where(ToDoChange.user_id == another_user.id)
+    )
+    horizon = await session.get(ToDoChangeHorizon, another_user.id)
+    assert deleted == len(old)
+    assert set(remaining.all()) == {recent.todo_id, todos[3].id}
+    assert horizon.seq == max(change.seq for change in old)
+    assert changes_purged_rows.value == purged_before + deleted
@@ -1,10 +1,17 @@
+import csv
+import io
+import json
 import uuid
 from http import HTTPStatus
 
-from sqlalchemy import select
+from fastapi import status
+from sqlalchemy import func, select
 
 from src.enums import ToDoStatus
+from src.events import sse_stream
 from src.models import ToDo
+from src.settings import get_settings
+from src.tasks import purge_expired_changes
 from tests.factories import ToDoFactory
 
 
@@ -133,6 +140,142 @@ async def test_list_todos_filter_combined_should_return_5_todos(
     assert len(response.json()['data']) == expected_todos
 
 
+async def test_list_todos_paginated_with_cursor(session, client, user, token):
+    todos = await session.scalars(select(ToDo).where(ToDo.user_id == user.id))
+    for todo in todos.all():
+        await session.delete(todo)
+    await session.commit()
+    session.add_all(ToDoFactory.create_batch(5, user_id=user.id))
+    await session.commit()
+
+    pages = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor is not None:
+            params['after'] = cursor
+        response = await client.get(
+            '/todos/',
+            params=params,
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        assert response.status_code == HTTPStatus.OK
+        pages.append([todo['id'] for todo in response.json()['data']])
+        cursor = response.json()['nextCursor']
+        if cursor is None:
+            break
+
+    ids = [todo_id for page in pages for todo_id in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+async def test_list_todos_invalid_cursor(client, token):
+    response = await client.get(
+        '/todos/?limit=2&after=not-a-cursor',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+async def test_list_todos_not_modified(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = await client.get('/todos/', headers=headers)
+    etag = response.headers['ETag']
+
+    response = await client.get(
+        '/todos/', headers=dict(headers, **{'If-None-Match': etag})
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+    assert not response.content
+
+    response = await client.get(
+        '/todos/?status=done', headers=dict(headers, **{'If-None-Match': etag})
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    await client.post('/todos/', json={'title': 'Changes'}, headers=headers)
+
+    response = await client.get(
+        '/todos/', headers=dict(headers, **{'If-None-Match': etag})
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+
+async def test_list_todos_search_ranks_by_relevance(
+    session, client, user, token
+):
+    session.add_all([
+        ToDoFactory(
+            user_id=user.id,
+            title='Zanzibar trip',
+            description='Book the zanzibar ferry',
+        ),
+        ToDoFactory(
+            user_id=user.id,
+            title='Packing list',
+            description='Sunscreen for zanzibar',
+        ),
+        ToDoFactory(
+            user_id=user.id, title='Groceries', description='Milk and eggs'
+        ),
+    ])
+    await session.commit()
+
+    response = await client.get(
+        '/todos/?q=zanzib',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    titles = [todo['title'] for todo in response.json()['data']]
+    assert response.status_code == HTTPStatus.OK
+    assert titles == ['Zanzibar trip', 'Packing list']
+
+
+async def test_list_todos_search_after_update(session, client, user, token):
+    todo = ToDoFactory(user_id=user.id, title='Old name')
+    session.add(todo)
+    await session.commit()
+
+    await client.patch(
+        f'/todos/{todo.id}',
+        json={'title': 'Quokka "feeding"'},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    response = await client.get(
+        '/todos/?q="quokka',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert [t['id'] for t in response.json()['data']] == [str(todo.id)]
+
+
+async def test_list_todos_search_rejects_blank_query(client, token):
+    response = await client.get(
+        '/todos/?q=%20%20',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_list_todos_search_rejects_cursor(client, token):
+    response = await client.get(
+        '/todos/?q=anything&after=AAAAAAAAAAAAAAAAAAAAAA',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Search results cannot use a cursor'}
+
+
 async def test_patch_todo_error(client, token, session, another_user):
     todo = ToDoFactory(user_id=another_user.id, description='description')
     session.add(todo)
@@ -180,6 +323,38 @@ async def test_patch_todo_done(session, client, user, token):
     assert response.json()['data']['status'] == 'done'
 
 
+async def test_patch_todo_if_match(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = await client.post(
+        '/todos/', json={'title': 'Versioned'}, headers=headers
+    )
+    todo_id = response.json()['data']['id']
+    etag = response.headers['ETag']
+
+    response = await client.patch(
+        f'/todos/{todo_id}',
+        json={'title': 'First writer'},
+        headers=dict(headers, **{'If-Match': etag}),
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+    response = await client.patch(
+        f'/todos/{todo_id}',
+        json={'title': 'Second writer'},
+        headers=dict(headers, **{'If-Match': etag}),
+    )
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert response.json() == {'detail': 'Precondition failed'}
+
+    response = await client.patch(
+        f'/todos/{uuid.uuid7()}',
+        json={'title': 'Missing'},
+        headers=dict(headers, **{'If-Match': etag}),
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
 async def test_delete_todo(session, client, user, token):
     todo = ToDoFactory(user_id=user.id)
 
@@ -197,6 +372,29 @@ async def test_delete_todo(session, client, user, token):
     }
 
 
+async def test_empty_trash(session, client, user, token, jobs):
+    trash = ToDoFactory.create_batch(3, user_id=user.id, status='trash')
+    kept = ToDoFactory(user_id=user.id, status='todo')
+    session.add_all([*trash, kept])
+    await session.commit()
+
+    response = await client.delete(
+        '/todos/trash', headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json() == {'message': 'Trash will be emptied shortly.'}
+
+    await jobs.join()
+
+    remaining = await session.scalars(
+        select(ToDo.id).where(
+            ToDo.user_id == user.id, ToDo.status == ToDoStatus.TRASH
+        )
+    )
+    assert remaining.all() == []
+    assert await session.scalar(select(func.count()).where(ToDo.id == kept.id))
+
+
 async def test_delete_todo_error(client, token):
     response = await client.delete(
         f'/todos/{uuid.uuid7()}', headers={'Authorization': f'Bearer {token}'}
@@ -204,3 +402,379 @@ async def test_delete_todo_error(client, token):
 
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json() == {'detail': 'Task not found'}
+
+
+async def test_todo_events_stream(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    chunks = sse_stream(user.id, keepalive=0.01)
+
+    # Idle streams send a comment; by then the stream is subscribed.
+    assert await anext(chunks) == ': keepalive\n\n'
+
+    response = await client.post(
+        '/todos/', json={'title': 'Live'}, headers=headers
+    )
+    todo_id = response.json()['data']['id']
+    await client.delete(f'/todos/{todo_id}', headers=headers)
+
+    created = await anext(chunks)
+    deleted = await anext(chunks)
+    await chunks.aclose()
+
+    assert created.startswith('event: created\ndata: ')
+    assert json.loads(created.split('data: ')[1])['title'] == 'Live'
+    assert deleted == f'event: deleted\ndata: {{"id":"{todo_id}"}}\n\n'
+
+
+async def test_todo_events_websocket(
+    client, token, asgi_stream, real_sessions, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), 'EVENTS_KEEPALIVE_SECONDS', 0.01)
+
+    async with asgi_stream(
+        'websocket', '/todos/events/ws', query_string=f'token={token}'
+    ) as websocket:
+        await websocket.send({'type': 'websocket.connect'})
+        assert (await websocket.receive())['type'] == 'websocket.accept'
+
+        # Subscribed by the time the first keepalive arrives.
+        keepalive = await websocket.receive()
+        assert json.loads(keepalive['text']) == {'type': 'keepalive'}
+
+        response = await client.post(
+            '/todos/',
+            json={'title': 'Over the socket'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        message = await websocket.receive()
+
+        while json.loads(message['text'])['type'] == 'keepalive':
+            message = await websocket.receive()
+
+    assert json.loads(message['text']) == {
+        'type': 'created',
+        'data': response.json()['data'],
+    }
+
+
+async def test_todo_events_endpoint(client, token, asgi_stream, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'EVENTS_KEEPALIVE_SECONDS', 0.01)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async with asgi_stream('http', '/todos/events', headers=headers) as stream:
+        start = await stream.receive()
+        assert start['status'] == HTTPStatus.OK
+        assert dict(start['headers'])[b'content-type'].startswith(
+            b'text/event-stream'
+        )
+
+        # Subscribed by the time the first keepalive arrives.
+        keepalive = await stream.receive()
+        assert keepalive['body'] == b': keepalive\n\n'
+
+        await client.post(
+            '/todos/', json={'title': 'Streamed'}, headers=headers
+        )
+        message = await stream.receive()
+
+        while message['body'] == b': keepalive\n\n':
+            message = await stream.receive()
+
+    assert message['body'].startswith(b'event: created\ndata: ')
+    data = message['body'].decode().split('data: ')[1]
+    assert json.loads(data)['title'] == 'Streamed'
+
+
+async def test_todo_events_websocket_rejects_invalid_token(asgi_stream):
+    async with asgi_stream(
+        'websocket', '/todos/events/ws', query_string='token=invalid'
+    ) as websocket:
+        await websocket.send({'type': 'websocket.connect'})
+        message = await websocket.receive()
+
+    assert message['type'] == 'websocket.close'
+    assert message['code'] == status.WS_1008_POLICY_VIOLATION
+
+
+async def test_todo_changes_since_token(client, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = await client.get('/todos/changes', headers=headers)
+    since = response.json()['syncToken']
+
+    created = await client.post(
+        '/todos/', json={'title': 'Sync'}, headers=headers
+    )
+    kept = await client.post(
+        '/todos/', json={'title': 'Keep'}, headers=headers
+    )
+    created_id = created.json()['data']['id']
+    kept_id = kept.json()['data']['id']
+    await client.patch(
+        f'/todos/{kept_id}', json={'status': 'doing'}, headers=headers
+    )
+    await client.delete(f'/todos/{created_id}', headers=headers)
+
+    response = await client.get(
+        '/todos/changes', params={'since': since}, headers=headers
+    )
+    changes = response.json()
+
+    assert response.status_code == HTTPStatus.OK
+    assert [todo['id'] for todo in changes['data']] == [kept_id]
+    assert changes['data'][0]['status'] == 'doing'
+    assert changes['deleted'] == [created_id]
+    assert changes['syncToken'] > since
+    assert changes['hasMore'] is False
+
+    response = await client.get(
+        '/todos/changes',
+        params={'since': changes['syncToken']},
+        headers=headers,
+    )
+
+    assert response.json() == {
+        'data': [],
+        'deleted': [],
+        'syncToken': changes['syncToken'],
+        'hasMore': False,
+    }
+
+
+async def test_todo_changes_since_pruned_token(
+    session, client, token, monkeypatch
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    since = (await client.get('/todos/changes', headers=headers)).json()[
+        'syncToken'
+    ]
+    gone = await client.post(
+        '/todos/', json={'title': 'Gone'}, headers=headers
+    )
+    gone_id = gone.json()['data']['id']
+    await client.delete(f'/todos/{gone_id}', headers=headers)
+    await client.post('/todos/', json={'title': 'Newer'}, headers=headers)
+    monkeypatch.setattr(get_settings(), 'TODO_CHANGES_RETENTION_DAYS', -1)
+    await purge_expired_changes(session)
+
+    response = await client.get(
+        '/todos/changes', params={'since': since}, headers=headers
+    )
+
+    assert response.status_code == HTTPStatus.GONE
+    assert response.json() == {
+        'detail': 'Sync token expired, sync again from scratch'
+    }
+
+    response = await client.get('/todos/changes', headers=headers)
+
+    assert response.status_code == HTTPStatus.OK
+    assert gone_id not in response.json()['deleted']
+
+
+async def test_todo_changes_rejects_out_of_range_token(client, token):
+    response = await client.get(
+        '/todos/changes',
+        params={'since': 2**63},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_todo_changes_pages(client, token, another_token):
+    headers = {'Authorization': f'Bearer {token}'}
+    since = (await client.get('/todos/changes', headers=headers)).json()[
+        'syncToken'
+    ]
+    await client.post(
+        '/todos/bulk', json=[{'title': 'A'}, {'title': 'B'}], headers=headers
+    )
+    await client.post(
+        '/todos/',
+        json={'title': 'Not mine'},
+        headers={'Authorization': f'Bearer {another_token}'},
+    )
+
+    first = await client.get(
+        '/todos/changes', params={'since': since, 'limit': 1}, headers=headers
+    )
+    second = await client.get(
+        '/todos/changes',
+        params={'since': first.json()['syncToken'], 'limit': 1},
+        headers=headers,
+    )
+
+    assert first.json()['hasMore'] is True
+    assert second.json()['hasMore'] is False
+    assert [
+        todo['title']
+        for page in (first, second)
+        for todo in page.json()['data']
+    ] == ['A', 'B']
+
+
+async def test_todo_stats_match_todos(
+    session, client, user, token, count_queries
+):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = await client.post(
+        '/todos/', json={'title': 'Stats', 'status': 'doing'}, headers=headers
+    )
+    todo_id = response.json()['data']['id']
+    await client.patch(
+        f'/todos/{todo_id}', json={'status': 'done'}, headers=headers
+    )
+    await client.post('/todos/bulk', json=[{'title': 'S'}], headers=headers)
+    await client.request(
+        'DELETE', '/todos/bulk', json=[todo_id], headers=headers
+    )
+
+    with count_queries() as statements:
+        response = await client.get('/todos/stats', headers=headers)
+
+    rows = await session.execute(
+        select(ToDo.status, func.count())
+        .where(ToDo.user_id == user.id)
+        .group_by(ToDo.status)
+    )
+    expected = {status.value: 0 for status in ToDoStatus}
+    expected.update(rows.tuples().all())
+    committed = expected['todo'] + expected['doing'] + expected['done']
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['data'] == {
+        'total': sum(expected.values()),
+        'byStatus': expected,
+        'completed': expected['done'],
+        'completionRate': expected['done'] / committed,
+    }
+    assert not any('FROM todos' in statement for statement in statements)
+
+
+async def test_create_todos_bulk(client, token, count_queries):
+    titles = ['Bulk one', 'Bulk two', 'Bulk three']
+
+    with count_queries() as statements:
+        response = await client.post(
+            '/todos/bulk',
+            json=[dict(title=title) for title in titles],
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+    data = response.json()['data']
+    assert response.status_code == HTTPStatus.OK
+    assert [todo['title'] for todo in data] == titles
+    assert {todo['status'] for todo in data} == {'todo'}
+    assert len([s for s in statements if s.startswith('INSERT')]) == 1
+
+
+async def test_create_todos_bulk_empty(client, token):
+    response = await client.post(
+        '/todos/bulk',
+        json=[],
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_patch_todos_bulk(session, client, user, another_user, token):
+    mine = ToDoFactory.create_batch(3, user_id=user.id, status=ToDoStatus.TODO)
+    theirs = ToDoFactory(user_id=another_user.id, status=ToDoStatus.TODO)
+    session.add_all([*mine, theirs])
+    await session.commit()
+
+    response = await client.patch(
+        '/todos/bulk',
+        json=[
+            dict(id=str(mine[0].id), status='done'),
+            dict(id=str(mine[1].id), status='done'),
+            dict(id=str(mine[2].id), title='Renamed'),
+            dict(id=str(theirs.id), status='done'),
+        ],
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [item['result'] for item in response.json()['data']] == [
+        'updated',
+        'updated',
+        'updated',
+        'not_found',
+    ]
+
+    for todo in [*mine, theirs]:
+        await session.refresh(todo)
+    assert mine[0].status == mine[1].status == ToDoStatus.DONE
+    assert mine[0].done_at is not None
+    assert mine[2].title == 'Renamed'
+    assert mine[2].done_at is None
+    assert theirs.status == ToDoStatus.TODO
+
+
+async def test_delete_todos_bulk(session, client, user, another_user, token):
+    mine = ToDoFactory(user_id=user.id)
+    theirs = ToDoFactory(user_id=another_user.id)
+    session.add_all([mine, theirs])
+    await session.commit()
+    missing = uuid.uuid7()
+
+    response = await client.request(
+        'DELETE',
+        '/todos/bulk',
+        json=[str(mine.id), str(theirs.id), str(missing)],
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['data'] == [
+        dict(id=str(mine.id), result='deleted'),
+        dict(id=str(theirs.id), result='not_found'),
+        dict(id=str(missing), result='not_found'),
+    ]
+    assert await session.get(ToDo, theirs.id) is not None
+
+
+async def test_export_todos_ndjson(session, client, user, token):
+    session.add_all(ToDoFactory.create_batch(3, user_id=user.id))
+    await session.commit()
+    expected_ids = await session.scalars(
+        select(ToDo.id).where(ToDo.user_id == user.id).order_by(ToDo.id)
+    )
+
+    response = await client.get(
+        '/todos/export',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [row['id'] for row in rows] == [str(i) for i in expected_ids]
+    assert {row['userId'] for row in rows} == {str(user.id)}
+
+
+async def test_export_todos_csv(session, client, user, token):
+    total = await session.scalar(
+        select(func.count()).select_from(ToDo).where(ToDo.user_id == user.id)
+    )
+
+    response = await client.get(
+        '/todos/export?format=csv',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/csv')
+    assert len(rows) == total
+    assert set(rows[0]) == {
+        'id',
+        'title',
+        'description',
+        'status',
+        'userId',
+        'createdAt',
+        'updatedAt',
+        'doneAt',
+    }
@@ -2,7 +2,12 @@ import asyncio
 from http import HTTPStatus
 from uuid import uuid7, uuid8
 
+from sqlalchemy import func, select
+
+from src.models import ToDo, ToDoChange, ToDoStatusCount
 from src.schemas import UserCreateInput, UserSchema
+from src.security.auth import user_cache
+from tests.factories import ToDoFactory
 
 
 async def test_index_users(client, user, another_user):
@@ -22,10 +27,51 @@ async def test_index_users(client, user, another_user):
                 createdAt=another_user.created_at.isoformat(),
                 updatedAt=another_user.updated_at.isoformat(),
             ),
-        ]
+        ],
+        nextCursor=None,
     )
 
 
+async def test_index_users_paginated(client, user, another_user):
+    response = await client.get('/users/', params=dict(limit=1))
+    first_page = response.json()
+    assert [row['id'] for row in first_page['data']] == [str(user.id)]
+
+    response = await client.get(
+        '/users/', params=dict(limit=1, after=first_page['nextCursor'])
+    )
+    second_page = response.json()
+    assert [row['id'] for row in second_page['data']] == [str(another_user.id)]
+    assert second_page['nextCursor'] is None
+
+
+async def test_index_users_username_prefix(client, user):
+    response = await client.get(
+        '/users/', params=dict(username=user.username[:-1])
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert str(user.id) in [row['id'] for row in response.json()['data']]
+
+    response = await client.get(
+        '/users/', params=dict(username=f'{user.username}~')
+    )
+    assert response.json()['data'] == []
+
+
+async def test_index_users_username_prefix_at_code_point_edges(client):
+    # The code point after U+D7FF is a surrogate, and none follows U+10FFFF.
+    for prefix in ['zz\ud7ff', 'zz\U0010ffff', '\U0010ffff']:
+        response = await client.get('/users/', params=dict(username=prefix))
+
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['data'] == []
+
+
+async def test_index_users_page_size_is_capped(client):
+    response = await client.get('/users/', params=dict(limit=101))
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 async def test_get_user(client, user):
     response = await client.get(f'/users/{user.id}')
     data = UserSchema(**response.json()['data'])
@@ -33,6 +79,17 @@ async def test_get_user(client, user):
     assert data == UserSchema(**user.__dict__)
 
 
+async def test_get_user_not_modified(client, user):
+    response = await client.get(f'/users/{user.id}')
+    etag = response.headers['ETag']
+
+    response = await client.get(
+        f'/users/{user.id}', headers={'If-None-Match': etag}
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['ETag'] == etag
+
+
 async def test_get_user_not_found(client):
     response = await client.get(f'/users/{uuid8()}')
     assert response.status_code == HTTPStatus.NOT_FOUND
@@ -81,6 +138,47 @@ async def test_update_user(client, user, token):
     assert data['updatedAt'] != updated_at_before.isoformat()
     assert data['id'] == str(user.id)
     assert 'createdAt' in data
+    assert user_cache.get(str(user.id)) is None
+
+
+async def test_update_user_password_revokes_tokens(client, user, token):
+    response = await client.put(
+        f'/users/{user.id}',
+        json=dict(password='12345678'),
+        headers=dict(Authorization=f'Bearer {token}'),
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = await client.get(
+        '/todos/', headers=dict(Authorization=f'Bearer {token}')
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    response = await client.get(
+        '/auth/me', headers=dict(Authorization=f'Bearer {token}')
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+async def test_update_user_if_match(client, user, token):
+    headers = dict(Authorization=f'Bearer {token}')
+    etag = (await client.get(f'/users/{user.id}')).headers['ETag']
+
+    response = await client.put(
+        f'/users/{user.id}',
+        json=dict(username='if_match_user'),
+        headers=dict(headers, **{'If-Match': etag}),
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+
+    response = await client.put(
+        f'/users/{user.id}',
+        json=dict(username='lost_update'),
+        headers=dict(headers, **{'If-Match': etag}),
+    )
+    assert response.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert response.json() == dict(detail='Precondition failed')
 
 
 async def test_update_user_not_found(client, token):
@@ -134,10 +232,28 @@ async def test_delete_user_forbidden(client, another_user, token):
     assert response.json() == dict(detail='Forbidden')
 
 
-async def test_delete_user(client, user, token):
+async def test_delete_user(session, client, user, token):
+    session.add_all(ToDoFactory.create_batch(3, user_id=user.id))
+    await session.commit()
+
     response = await client.delete(
         f'/users/{user.id}',
         headers=dict(Authorization=f'Bearer {token}'),
     )
     assert response.status_code == HTTPStatus.OK
     assert response.json() == dict(message='User deleted')
+    assert user_cache.get(str(user.id)) is None
+
+    response = await client.get(
+        '/auth/me', headers=dict(Authorization=f'Bearer {token}')
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    response = await client.get(f'/users/{user.id}')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+    for model in (ToDo, ToDoStatusCount, ToDoChange):
+        remaining = await session.scalar(
+            select(func.count()).where(model.user_id == user.id)
+        )
+        assert remaining == 0, model